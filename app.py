@@ -2,8 +2,11 @@ import dash
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 
+from helpers import background
+
 dbc_css = "https://cdn.jsdelivr.net/gh/AnnMarieW/dash-bootstrap-templates/dbc.min.css"
-app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.PULSE, dbc_css])
+app = dash.Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.PULSE, dbc_css],
+    background_callback_manager=background.background_callback_manager)
 server = app.server
 
 sm_bar = dbc.Row(
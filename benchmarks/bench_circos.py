@@ -0,0 +1,169 @@
+# Compares the vectorized Circos ring builder in helpers/circos_helpers.py against the
+# original per-row position loop and (day x holiday) matching on 1, 5 and 20 year ranges,
+# using the multi-year US calendar from data/special_events.csv.
+#
+#   python -m benchmarks.bench_circos          (1, 5 and 20 years)
+#   python -m benchmarks.bench_circos 1 2
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from helpers import circos_helpers
+
+DEFAULT_YEARS = [1, 5, 20]
+ROWS_PER_DAY = 50
+
+def legacy_build_circos_data(df: pd, holidays: pd) -> dict():
+    # sales ring - groupby transformation
+    dollars_ring_df = df.groupby(['Date'])['sale_dollars'].sum().round(2).reset_index(name='value')
+    dollars_ring_df.set_index('Date', inplace=True)
+    # sales ring - fill missing dates (weekends/holidays)
+    dollars_ring_df = dollars_ring_df.resample('D').first().fillna(0).reset_index()
+    dollars_ring_df['year_month'] = (dollars_ring_df['Date']).dt.year.astype(str) + '-' + (dollars_ring_df['Date']).dt.month.astype(str)
+
+    # volume sold litres ring - groupby transformation
+    volume_ring_df = df.groupby(['Date'])['sale_dollars'].sum().round(2).reset_index(name='value')
+    volume_ring_df.set_index('Date', inplace=True)
+    # volume sold litres ring - fill missing dates (weekends/holidays)
+    volume_ring_df = volume_ring_df.resample('D').first().fillna(0).reset_index()
+    volume_ring_df['year_month'] = (volume_ring_df['Date']).dt.year.astype(str) + '-' + (volume_ring_df['Date']).dt.month.astype(str)
+
+    # bottles sold ring - groupby transformation
+    bottles_ring_df = df.groupby(['Date'])['bottles_sold'].sum().round(2).reset_index(name='value')
+    bottles_ring_df.set_index('Date', inplace=True)
+    # bottles sold ring - fill missing dates (weekends/holidays)
+    bottles_ring_df = bottles_ring_df.resample('D').first().fillna(0).reset_index()
+    bottles_ring_df['year_month'] = (bottles_ring_df['Date']).dt.year.astype(str) + '-' + (bottles_ring_df['Date']).dt.month.astype(str)
+
+    text_ring_df = bottles_ring_df[['year_month', 'Date']].sort_values(by='Date')
+
+    dollars_ring_df.sort_values(by=['Date'], ignore_index=True, inplace=True)
+    volume_ring_df.sort_values(by=['Date'], ignore_index=True, inplace=True)
+    bottles_ring_df.sort_values(by=['Date'], ignore_index=True, inplace=True)
+
+    inc = 0
+    text_inc = 0.5
+    starts = []
+    ends = []
+    text_positions = []
+    no_of_rows = len(bottles_ring_df.index.tolist())
+
+    for idx in bottles_ring_df.index:
+        starts.append(inc)
+        ends.append(inc+1)
+        text_positions.append(text_inc)
+
+        if (idx == no_of_rows-1):
+            break
+
+        if (bottles_ring_df['year_month'].loc[idx] == bottles_ring_df['year_month'].loc[idx+1]):
+            inc += 1
+            text_inc += 1
+        else:
+            inc = 0
+            text_inc = 0.5  
+
+    # 1st ring - text - dates
+    text_ring_df['position'] = text_positions
+    text_ring_df.rename(columns={"year_month": "block_id", "Date": "value"}, inplace=True)
+    text_ring_df = text_ring_df[['block_id', 'position', 'value']]
+
+    # 2nd ring - heatmap - sale dollars
+    dollars_ring_df.rename(columns={'year_month': 'block_id'}, inplace=True)
+    dollars_ring_df['start'] = starts
+    dollars_ring_df['end'] = ends
+
+    dollars_ring_df = dollars_ring_df[['block_id', 'Date', 'start', 'end', 'value']]
+    dollars_ring_df.sort_values(by=['Date'], inplace=True)
+
+    # 3rd ring - heatmap - volume sold litres
+    volume_ring_df.rename(columns={'year_month': 'block_id'}, inplace=True)
+    volume_ring_df['start'] = starts
+    volume_ring_df['end'] = ends
+
+    volume_ring_df = volume_ring_df[['block_id', 'Date', 'start', 'end', 'value']]
+    volume_ring_df.sort_values(by=['Date'], inplace=True)
+
+    # 3rd ring - heatmap - bottles sold
+    bottles_ring_df.rename(columns={'year_month': 'block_id'}, inplace=True)
+    bottles_ring_df['start'] = starts
+    bottles_ring_df['end'] = ends
+
+    bottles_ring_df = bottles_ring_df[['block_id', 'Date', 'start', 'end', 'value']]
+    bottles_ring_df.sort_values(by=['Date'], inplace=True)
+
+    hols = []
+    for i in bottles_ring_df.index:
+        for j in holidays.index:
+            if (pd.to_datetime(bottles_ring_df['Date'].loc[i], format="%Y-%m-%d") == pd.to_datetime(holidays['Date'].loc[j], format="%Y-%m-%d")):
+                hols.append(
+                    {
+                        'block_id': bottles_ring_df['block_id'].loc[i],
+                        'date': bottles_ring_df['Date'].loc[i],
+                        'holiday': holidays['holiday'].loc[j],
+                        'start': bottles_ring_df['start'].loc[i],
+                        'end': bottles_ring_df['end'].loc[i],
+                        'color': 'red'
+                    }
+                )
+
+    holidays_ring_df = pd.DataFrame(hols)
+
+    # base layout
+    calendar = bottles_ring_df.value_counts(['block_id'], sort=False).reset_index(name='len')
+    calendar.sort_values(by=['block_id'], inplace=True)
+
+    calendar['label'] = calendar['block_id']
+    calendar['color'] = "#ffffff"
+    calendar.rename(columns={'block_id': 'id'}, inplace=True)
+    calendar = calendar[['id', 'label', 'color', 'len']]
+
+    return {
+        'sales_histogram': circos_helpers._to_records(bottles_ring_df),
+        'income_histogram': circos_helpers._to_records(dollars_ring_df),
+        'volume_histogram': circos_helpers._to_records(volume_ring_df),
+        'text': circos_helpers._to_records(text_ring_df),
+        'holidays': circos_helpers._to_records(holidays_ring_df),
+        'calendar': circos_helpers._to_records(calendar)
+    }
+
+def build_circos_data(df: pd, holidays: pd) -> dict():
+    return circos_helpers.build_circos_data(circos_helpers.aggregate_daily_metrics(df), holidays)
+
+def synthetic_sales_data(years: int) -> pd:
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range('2021-12-31', periods=years * 261, freq='-1B')[::-1]
+    rows = len(dates) * ROWS_PER_DAY
+
+    df = pd.DataFrame({
+        'Date': np.repeat(dates.to_numpy(), ROWS_PER_DAY),
+        'sale_dollars': rng.gamma(2, 100, rows).round(2),
+        'volume_sold_liters': rng.gamma(2, 5, rows).round(2),
+        'bottles_sold': rng.integers(1, 48, rows)
+    })
+    df['year_month'] = (df['Date']).dt.year.astype(str) + '-' + (df['Date']).dt.month.astype(str)
+
+    return df
+
+def time_build(build, df: pd, holidays: pd) -> float:
+    start = time.perf_counter()
+    build(df, holidays)
+    return time.perf_counter() - start
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    years = [int(year) for year in argv] or DEFAULT_YEARS
+    holidays = circos_helpers.load_holidays("special_events.csv")
+
+    print("{:>6} {:>8} {:>12} {:>12} {:>9}".format("years", "days", "legacy (s)", "current (s)", "speedup"))
+    for year in years:
+        df = synthetic_sales_data(year)
+        legacy = time_build(legacy_build_circos_data, df, holidays)
+        current = time_build(build_circos_data, df, holidays)
+        print("{:>6} {:>8} {:>12.2f} {:>12.2f} {:>8.1f}x".format(year, df['Date'].nunique(), legacy, current, legacy / current))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+# Compares the vectorized date-feature derivation in helpers/data_transformation.py
+# against the original row-by-row implementation on synthetic data.
+#
+#   python -m benchmarks.bench_transform              (1M, 10M and 30M rows)
+#   python -m benchmarks.bench_transform 100000 1000000
+import sys
+import time
+import datetime
+import numpy as np
+import pandas as pd
+
+from helpers import data_transformation
+
+DEFAULT_SIZES = [1000000, 10000000, 30000000]
+
+def legacy_transform_sales_data_overview(df):
+    df['Date'] = pd.to_datetime(df['date'], format='%m/%d/%Y')
+
+    df['weekday'] = (df['Date']).dt.day_name()
+    df['day'] = (df['Date']).dt.day
+    df['month'] = (df['Date']).dt.month
+    df['year'] = (df['Date']).dt.year
+    df['month_year'] = df['month'].astype(str) + '-' + df['year'].astype(str)
+    df['year_month'] = df['year'].astype(str) + '-' + df['month'].astype(str)
+    df['year_weeknumber'] = df['year'].astype(str) + '-' + 'W' + (df['Date']).dt.isocalendar().week.astype(str)
+    df['week_start_date'] = [datetime.datetime.strptime(x + '-1', '%G-W%V-%u') for x in df['year_weeknumber'].tolist()]
+    df['county'] = df['county'].str.capitalize()
+
+    df.sort_values(['Date'], inplace=True)
+
+    return df
+
+def synthetic_sales_data(rows: int) -> pd:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2012-01-01', '2021-12-31', freq='D').strftime('%m/%d/%Y')
+    counties = np.array(['POLK', 'LINN', 'SCOTT', 'JOHNSON', 'BLACK HAWK', 'WOODBURY', 'DUBUQUE', 'STORY'])
+
+    return pd.DataFrame({
+        'date': dates.to_numpy()[rng.integers(0, len(dates), rows)],
+        'county': counties[rng.integers(0, len(counties), rows)]
+    })
+
+def time_transform(transform, df: pd) -> float:
+    start = time.perf_counter()
+    transform(df.copy())
+    return time.perf_counter() - start
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    sizes = [int(size) for size in argv] or DEFAULT_SIZES
+
+    print("{:>12} {:>12} {:>12} {:>9}".format("rows", "legacy (s)", "current (s)", "speedup"))
+    for rows in sizes:
+        df = synthetic_sales_data(rows)
+        legacy = time_transform(legacy_transform_sales_data_overview, df)
+        current = time_transform(data_transformation.transform_sales_data_overview, df)
+        print("{:>12} {:>12.2f} {:>12.2f} {:>8.1f}x".format(rows, legacy, current, legacy / current))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
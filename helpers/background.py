@@ -0,0 +1,87 @@
+import os
+import time
+import threading
+import diskcache
+from dash import DiskcacheManager
+
+from . import dataset
+
+JOBSPATH = os.path.join(dataset.CACHEPATH, "jobs")
+
+# results of finished jobs are kept for a day
+JOB_RESULTS_EXPIRE = 24 * 60 * 60
+
+# a request waits this long at most for another request to finish starting the same job
+JOB_START_TIMEOUT = 60
+
+_STARTING = 'starting'
+
+class SharedJobsManager(DiskcacheManager):
+    # identical requests in flight share one job - Dash starts a process for every request, the first
+    # request for a cache key claims it (cache.add is atomic across the workers), later ones get the
+    # running job's id and poll its result. A shared job is only stopped once none of its requests needs it
+
+    # a job is started by forking the worker - no other thread of the worker may be inside the job
+    # cache's sqlite at that moment, or the job inherits its locks
+    _fork_lock = threading.Lock()
+
+    def _job_key(self, key) -> str:
+        return key + '-job'
+
+    def _waiters_key(self, job) -> str:
+        return 'job-' + str(job) + '-waiters'
+
+    def _job_cache_key(self, job) -> str:
+        return 'job-' + str(job) + '-key'
+
+    def call_job_fn(self, key, job_fn, *args):
+        job_key = self._job_key(key)
+        deadline = time.time() + JOB_START_TIMEOUT
+
+        while (True):
+            with self._fork_lock:
+                if (self.handle.add(job_key, _STARTING, expire=JOB_START_TIMEOUT)):
+                    job = super().call_job_fn(key, job_fn, *args)
+                    self.handle.set(self._job_cache_key(job), key, expire=self.expire)
+                    self.handle.set(self._waiters_key(job), 1, expire=self.expire)
+                    self.handle.set(job_key, job, expire=self.expire)
+                    return job
+
+                job = self.handle.get(job_key)
+
+                if (job is not None and job != _STARTING and self.job_running(job) and not self.result_ready(key)):
+                    self.handle.incr(self._waiters_key(job), default=0)
+                    return job
+
+                if (job != _STARTING or time.time() >= deadline):
+                    # the job finished, died or never got started - the next request for the key starts a new one
+                    with self.handle.transact():
+                        if (self.handle.get(job_key) == job):
+                            self.handle.delete(job_key)
+                    continue
+
+            # another worker is starting the job
+            time.sleep(0.05)
+
+    def terminate_job(self, job):
+        if (job is None):
+            return
+
+        # cancelled by one of its requests while others still wait for it - keep it running
+        with self._fork_lock:
+            key = self.handle.get(self._job_cache_key(job))
+            if (key is not None and not self.result_ready(key)):
+                if (self.handle.decr(self._waiters_key(job), default=1) > 0):
+                    return
+
+        super().terminate_job(job)
+
+# local stand-in for a job broker - every background callback runs in its own process and hands its
+# progress and result back through a disk cache shared by the workers of the machine. Results are keyed
+# on the callback inputs and the data version, so a request that was already answered is served from
+# the cache, and identical requests in flight share one job
+background_callback_manager = SharedJobsManager(
+    diskcache.Cache(JOBSPATH),
+    cache_by=[dataset.get_data_version],
+    expire=JOB_RESULTS_EXPIRE
+)
@@ -0,0 +1,152 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from . import dataset
+
+SEGMENT_COLUMNS = ['liquor_type', 'vendor_name']
+SERIES_METRICS = ['bottles_sold', 'volume_sold_liters']
+
+_lock = threading.Lock()
+_daily_series = None
+
+def build_daily_series(df: pd) -> dict():
+    # daily totals of every (liquor_type, vendor_name) segment as dense dates x segments matrices, plus
+    # the invoice row counts and the row-level min/max of each metric (for the normalized RMSE)
+    aggregations = {'rows': ('Date', 'size')}
+    for metric in SERIES_METRICS:
+        aggregations[metric] = (metric, 'sum')
+        aggregations[metric + '_min'] = (metric, 'min')
+        aggregations[metric + '_max'] = (metric, 'max')
+
+    grouped = df.groupby(['Date'] + SEGMENT_COLUMNS, observed=True, dropna=False).agg(**aggregations).reset_index()
+
+    dates = pd.DatetimeIndex(np.sort(grouped['Date'].unique()))
+    date_codes = dates.get_indexer(grouped['Date'])
+
+    segment_groups = grouped.groupby(SEGMENT_COLUMNS, observed=True, dropna=False, sort=False)
+    segment_codes = segment_groups.ngroup().to_numpy()
+    segments = grouped.loc[~pd.Series(segment_codes).duplicated().to_numpy(), SEGMENT_COLUMNS].astype(object).reset_index(drop=True)
+
+    shape = (len(dates), len(segments))
+    rows = np.zeros(shape, dtype=np.int64)
+    rows[date_codes, segment_codes] = grouped['rows'].to_numpy()
+
+    store = {'dates': dates, 'segments': segments, 'rows': rows, 'values': {}, 'min': {}, 'max': {}}
+    for metric in SERIES_METRICS:
+        values = np.zeros(shape)
+        values[date_codes, segment_codes] = grouped[metric].to_numpy(dtype=float)
+        store['values'][metric] = values
+        store['min'][metric] = segment_groups[metric + '_min'].min().to_numpy(dtype=float)
+        store['max'][metric] = segment_groups[metric + '_max'].max().to_numpy(dtype=float)
+
+    return store
+
+def merge_daily_series(store: dict(), other: dict()) -> dict():
+    # daily series of the union of two sets of invoice rows - totals and row counts are added,
+    # the row-level extremes combined
+    dates = store['dates'].union(other['dates'])
+    segments = pd.concat([store['segments'], other['segments']], ignore_index=True).drop_duplicates(ignore_index=True)
+    segment_index = pd.MultiIndex.from_frame(segments)
+
+    merged = {'dates': dates, 'segments': segments, 'rows': np.zeros((len(dates), len(segments)), dtype=np.int64),
+        'values': {}, 'min': {}, 'max': {}}
+    for metric in SERIES_METRICS:
+        merged['values'][metric] = np.zeros((len(dates), len(segments)))
+        merged['min'][metric] = np.full(len(segments), np.nan)
+        merged['max'][metric] = np.full(len(segments), np.nan)
+
+    for part in [store, other]:
+        date_positions = dates.get_indexer(part['dates'])
+        segment_positions = segment_index.get_indexer(pd.MultiIndex.from_frame(part['segments']))
+        cells = np.ix_(date_positions, segment_positions)
+
+        merged['rows'][cells] += part['rows']
+        for metric in SERIES_METRICS:
+            merged['values'][metric][cells] += part['values'][metric]
+            merged['min'][metric][segment_positions] = np.fmin(merged['min'][metric][segment_positions], part['min'][metric])
+            merged['max'][metric][segment_positions] = np.fmax(merged['max'][metric][segment_positions], part['max'][metric])
+
+    return merged
+
+def get_daily_series() -> dict():
+    global _daily_series
+
+    if (_daily_series is None):
+        with _lock:
+            if (_daily_series is None):
+                _daily_series = build_daily_series(dataset.get_forecasting_df())
+
+    return _daily_series
+
+def append_rows(store: dict(), new_rows: pd) -> dict():
+    # series of store with newly appended invoice rows (transformed like the sales frame) folded in,
+    # only the new rows are aggregated - store is None before the first rows
+    update = build_daily_series(new_rows)
+    return update if (store is None) else merge_daily_series(store, update)
+
+def write_daily_series(store: dict(), path: str):
+    # segments are written as strings with a mask of the missing ones, the file loads without pickle
+    arrays = {'dates': store['dates'].to_numpy().astype('datetime64[ns]').astype(np.int64), 'rows': store['rows']}
+    for column in SEGMENT_COLUMNS:
+        missing = store['segments'][column].isna().to_numpy()
+        arrays[column] = np.where(missing, '', store['segments'][column].astype(str)).astype(str)
+        arrays[column + '_missing'] = missing
+    for metric in SERIES_METRICS:
+        arrays['values_' + metric] = store['values'][metric]
+        arrays['min_' + metric] = store['min'][metric]
+        arrays['max_' + metric] = store['max'][metric]
+
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+def read_daily_series(path: str) -> dict():
+    with np.load(path) as arrays:
+        segments = pd.DataFrame({column: np.where(arrays[column + '_missing'], None, arrays[column].astype(object)) for column in SEGMENT_COLUMNS})
+        store = {'dates': pd.DatetimeIndex(arrays['dates'].astype('datetime64[ns]')), 'segments': segments, 'rows': arrays['rows'],
+            'values': {}, 'min': {}, 'max': {}}
+        for metric in SERIES_METRICS:
+            store['values'][metric] = arrays['values_' + metric]
+            store['min'][metric] = arrays['min_' + metric]
+            store['max'][metric] = arrays['max_' + metric]
+
+    return store
+
+def _segment_mask(store: dict(), type_dropdown: list(), vendor_dropdown: list()) -> np.ndarray:
+    # same semantics as utils.filter_df_by_dropdown_select - an empty selection does not filter
+    mask = np.ones(len(store['segments'].index), dtype=bool)
+
+    for column, selection in zip(SEGMENT_COLUMNS, [type_dropdown, vendor_dropdown]):
+        if (selection != None and len(selection) > 0):
+            mask &= store['segments'][column].isin(selection).to_numpy()
+
+    return mask
+
+def has_rows(type_dropdown: list(), vendor_dropdown: list()) -> bool:
+    store = get_daily_series()
+    return bool(store['rows'][:, _segment_mask(store, type_dropdown, vendor_dropdown)].any())
+
+def get_training_series(type_dropdown: list(), vendor_dropdown: list(), var_to_forecast: str) -> dict():
+    # daily ds/y series of the selected segments, the same as grouping the filtered invoice rows by Date,
+    # with the row-level min/max of the metric - None when no row matches the filters
+    store = get_daily_series()
+    mask = _segment_mask(store, type_dropdown, vendor_dropdown)
+
+    rows = store['rows'][:, mask].sum(axis=1)
+    days = rows > 0
+    if (not days.any()):
+        return None
+
+    series = pd.DataFrame({
+        'ds': store['dates'][days],
+        'y': store['values'][var_to_forecast][days][:, mask].sum(axis=1)
+    })
+
+    return {
+        'series': series,
+        'min': float(np.nanmin(store['min'][var_to_forecast][mask])),
+        'max': float(np.nanmax(store['max'][var_to_forecast][mask]))
+    }
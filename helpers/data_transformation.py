@@ -1,21 +1,101 @@
 import warnings
 warnings.simplefilter('ignore')
 
+import numpy as np
 import pandas as pd
-import datetime
+
+# bump whenever the transformations below change, it invalidates the on-disk sales data cache
+TRANSFORM_VERSION = 4
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# load schema of the raw sales CSV - repeated text columns are read straight into categoricals
+SALES_DTYPES = {
+    'date': 'category',
+    'county': 'category',
+    'city': 'category',
+    'category_name': 'category',
+    'vendor_name': 'category',
+    'liquor_type': 'category',
+    'store_name': 'category',
+    'address': 'category',
+    'store_location': 'category'
+}
+
+# grain of the sales cube - the Insights pages only ever group/filter by these, everything else in
+# the cube is a function of them (dates derived from Date, coordinates from store_location)
+CUBE_DIMENSIONS = ['Date', 'store_name', 'address', 'store_location', 'city', 'county', 'category_name', 'liquor_type', 'vendor_name']
+CUBE_ATTRIBUTES = ['week_start_date', 'year_month', 'lat', 'lon']
+CUBE_MEASURES = ['sale_dollars', 'bottles_sold', 'volume_sold_liters']
+
+# counts are downcast after loading, money/price/volume columns stay float64 as they are summed into the KPIs
+SALES_INTEGER_COLUMNS = ['bottles_sold', 'pack']
+
+def apply_sales_schema(df):
+    for column, dtype in SALES_DTYPES.items():
+        if (column in df.columns and df[column].dtype != dtype):
+            df[column] = df[column].astype(dtype)
+
+    for column in SALES_INTEGER_COLUMNS:
+        if (column in df.columns and pd.api.types.is_integer_dtype(df[column])):
+            df[column] = pd.to_numeric(df[column], downcast='integer')
+
+    return df
+
+def _factorize(values):
+    if (isinstance(values.dtype, pd.CategoricalDtype)):
+        return values.cat.codes.to_numpy(), values.cat.categories
+
+    return pd.factorize(values)
+
+def _map_categories(values, func) -> pd:
+    # apply a string function to the distinct values only, categories that end up equal are merged
+    codes, uniques = _factorize(values)
+    new_codes, new_uniques = pd.factorize(func(pd.Series(uniques)), sort=True)
+    codes = np.where(codes >= 0, new_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, categories=new_uniques), index=values.index)
+
+def _categories_to_float(values, func) -> pd:
+    codes, uniques = _factorize(values)
+    parsed = func(pd.Series(uniques)).to_numpy(dtype=float)
+    return pd.Series(np.where(codes >= 0, parsed[codes], np.nan), index=values.index)
+
+def _period_categorical(keys, label) -> pd:
+    # integer period keys (e.g. 202103) -> chronologically ordered categorical of their labels,
+    # only the distinct periods are formatted as strings
+    codes, uniques = pd.factorize(keys, sort=True)
+    return pd.Categorical.from_codes(codes, categories=[label(key) for key in uniques], ordered=True)
+
+def _parse_dates(values, date_format: str) -> pd:
+    # dates repeat a lot (one value per day), parse each distinct string once
+    codes, uniques = _factorize(values)
+    parsed = pd.to_datetime(uniques, format=date_format)
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index)
+
+def _year_month(dates) -> pd:
+    keys = dates.dt.year.to_numpy() * 100 + dates.dt.month.to_numpy()
+    return _period_categorical(keys, lambda key: str(key // 100) + '-' + str(key % 100))
 
 def transform_sales_data_overview(df):
-    df['Date'] = pd.to_datetime(df['date'], format='%m/%d/%Y')
-
-    df['weekday'] = (df['Date']).dt.day_name()
-    df['day'] = (df['Date']).dt.day
-    df['month'] = (df['Date']).dt.month
-    df['year'] = (df['Date']).dt.year
-    df['month_year'] = df['month'].astype(str) + '-' + df['year'].astype(str)
-    df['year_month'] = df['year'].astype(str) + '-' + df['month'].astype(str)
-    df['year_weeknumber'] = df['year'].astype(str) + '-' + 'W' + (df['Date']).dt.isocalendar().week.astype(str)
-    df['week_start_date'] = [datetime.datetime.strptime(x + '-1', '%G-W%V-%u') for x in df['year_weeknumber'].tolist()]
-    df['county'] = df['county'].str.capitalize()
+    df['Date'] = _parse_dates(df['date'], '%m/%d/%Y')
+
+    weekday = (df['Date']).dt.weekday.to_numpy()
+    df['weekday'] = pd.Categorical.from_codes(weekday, categories=WEEKDAYS)
+    df['day'] = (df['Date']).dt.day.astype('int8')
+    df['month'] = (df['Date']).dt.month.astype('int8')
+    df['year'] = (df['Date']).dt.year.astype('int16')
+
+    month_keys = df['year'].to_numpy().astype('int32') * 100 + df['month'].to_numpy()
+    df['month_year'] = _period_categorical(month_keys, lambda key: str(key % 100) + '-' + str(key // 100))
+    df['year_month'] = _period_categorical(month_keys, lambda key: str(key // 100) + '-' + str(key % 100))
+
+    # ISO week of the date and the Monday it starts on
+    iso_calendar = (df['Date']).dt.isocalendar()
+    week_keys = iso_calendar['year'].to_numpy().astype('int64') * 100 + iso_calendar['week'].to_numpy().astype('int64')
+    df['year_weeknumber'] = _period_categorical(week_keys, lambda key: str(key // 100) + '-W' + str(key % 100))
+    df['week_start_date'] = df['Date'] - pd.to_timedelta(weekday, unit='D')
+
+    df['county'] = _map_categories(df['county'], lambda counties: counties.str.capitalize())
 
     df.sort_values(['Date'], inplace=True)
 
@@ -24,23 +104,46 @@ def transform_sales_data_overview(df):
 def transform_sales_data_by_store(df):
     transformed = transform_sales_data_overview(df)
 
-    transformed.loc[transformed['store_location'] == 'POINT (-95.79728 45.009612)', 'store_location'] = 'POINT (-91.11346 40.80724)'
-    transformed.loc[transformed['store_location'] == 'POINT (-73.982421 40.305231000000006)', 'store_location'] = 'POINT (-94.44483 42.95923)'
-    transformed['lat'] = transformed['store_location'].str.split(' ').str.get(2).str.replace(')', '').astype(float)
-    transformed['lon'] = transformed['store_location'].str.split(' ').str.get(1).str.replace('(', '').astype(float)
+    # fix-ups and coordinate parsing run on the distinct store locations only
+    location_fixes = {
+        'POINT (-95.79728 45.009612)': 'POINT (-91.11346 40.80724)',
+        'POINT (-73.982421 40.305231000000006)': 'POINT (-94.44483 42.95923)'
+    }
+    transformed['store_location'] = _map_categories(transformed['store_location'], lambda locations: locations.replace(location_fixes))
+    transformed['lat'] = _categories_to_float(transformed['store_location'], lambda locations: locations.str.split(' ').str.get(2).str.replace(')', '', regex=False).astype(float))
+    transformed['lon'] = _categories_to_float(transformed['store_location'], lambda locations: locations.str.split(' ').str.get(1).str.replace('(', '', regex=False).astype(float))
 
     return transformed
 
 def transform_sales_data_forecasting(df):
-    df['Date'] = pd.to_datetime(df['date'], format='%m/%d/%Y')
+    df['Date'] = _parse_dates(df['date'], '%m/%d/%Y')
     df.sort_values(['Date'], inplace=True)
 
     return df
 
 def transform_sales_data_eda(df):
     transformed = transform_sales_data_forecasting(df)
-    transformed['weekday'] = (transformed['Date']).dt.day_name()
-    transformed['year_month'] = (transformed['Date']).dt.year.astype(str) + '-' + (transformed['Date']).dt.month.astype(str)
+    transformed['weekday'] = pd.Categorical.from_codes((transformed['Date']).dt.weekday.to_numpy(), categories=WEEKDAYS)
+    transformed['year_month'] = _year_month(transformed['Date'])
 
     return transformed
 
+def build_sales_cube(df):
+    # daily x store x category x vendor rollup of the transformed sales frame, sorted by Date, with
+    # the summed measures and the number of invoice lines ('orders') behind each cell
+    keys = pd.DataFrame({'Date': df['Date'].to_numpy().view('int64')})
+    for column in CUBE_DIMENSIONS[1:]:
+        # grouping on the codes keeps missing values as their own cell (-1), like the invoice lines
+        keys[column] = _factorize(df[column])[0]
+
+    group_ids = keys.groupby(list(keys.columns), sort=True).ngroup().to_numpy()
+    _, first_positions = np.unique(group_ids, return_index=True)
+    n_groups = len(first_positions)
+
+    cube = df[CUBE_DIMENSIONS + CUBE_ATTRIBUTES].iloc[first_positions].reset_index(drop=True)
+    for column in CUBE_MEASURES:
+        sums = np.bincount(group_ids, weights=np.nan_to_num(df[column].to_numpy(dtype=float)), minlength=n_groups)
+        cube[column] = sums.round().astype('int64') if pd.api.types.is_integer_dtype(df[column]) else sums
+    cube['orders'] = np.bincount(group_ids, minlength=n_groups)
+
+    return cube
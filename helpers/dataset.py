@@ -0,0 +1,286 @@
+import os
+import sys
+import time
+import json
+import shutil
+import hashlib
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+from . import data_transformation
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
+CACHEPATH = os.path.join(DATAPATH, "cache")
+
+SALES_CSV = os.path.join(DATAPATH, "Iowa_liquor_sales_2021_minimal_with_type.csv")
+SALES_CACHE = os.path.join(CACHEPATH, "sales.feather")
+# the cube is stored as one Arrow IPC file per month (<SALES_CUBE_PARTITIONS>/<version>/year=2021/month=3/part-0.feather), date
+# range queries only map the months they overlap. Same year/month layout as the invoice rows written by helpers.ingest,
+# but a different format: those are compressed parquet for storage, the cube files are uncompressed so they can be
+# memory mapped and shared by the workers. Every build is a new version directory, the CURRENT file names the one served
+SALES_CUBE_PARTITIONS = os.path.join(CACHEPATH, "sales_cube")
+SALES_CACHE_META = os.path.join(CACHEPATH, "sales.json")
+
+_lock = threading.RLock()
+_sales_df = None
+_sales_cube = None
+# months of the cube versions read by this process
+_cube_months = dict()
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+def _source_fingerprint(path: str) -> dict():
+    stat = os.stat(path)
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'transform_version': data_transformation.TRANSFORM_VERSION
+    }
+
+def _write_json_atomic(path: str, data: dict()):
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, indent=4)
+    os.replace(tmp_path, path)
+
+def _write_feather_atomic(df: pd, path: str):
+    tmp_path = path + '.' + str(os.getpid()) + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+
+def month_partition_directory(root: str, year: int, month: int) -> str:
+    # year=2021/month=3 - the layout of every month partitioned dataset of the app
+    return os.path.join(root, 'year=' + str(year), 'month=' + str(month))
+
+def list_month_partitions(root: str) -> list():
+    # (year, month) of the partitions under root, in chronological order
+    months = []
+    for year_name in os.listdir(root):
+        if (year_name.startswith('year=')):
+            for month_name in os.listdir(os.path.join(root, year_name)):
+                if (month_name.startswith('month=')):
+                    months.append((int(year_name[len('year='):]), int(month_name[len('month='):])))
+
+    return sorted(months)
+
+def read_cube_version(path: str) -> str:
+    try:
+        with open(os.path.join(path, 'CURRENT')) as file:
+            version = file.read().strip()
+    except OSError:
+        return None
+
+    return version if (version and os.path.isdir(os.path.join(path, version))) else None
+
+def _write_month_partitions_atomic(df: pd, path: str):
+    # one file per month of the date-sorted frame, written to a new version directory - the categoricals keep
+    # all their categories in every file, so the months concatenate back without recoding
+    version = 'v' + str(time.time_ns()) + '-' + str(os.getpid())
+    tmp_path = os.path.join(path, version + '.tmp')
+    os.makedirs(tmp_path)
+
+    month_keys = df['Date'].dt.year.to_numpy() * 100 + df['Date'].dt.month.to_numpy()
+    keys, starts = np.unique(month_keys, return_index=True)
+    ends = np.append(starts[1:], len(month_keys))
+
+    for key, start, end in zip(keys, starts, ends):
+        directory = month_partition_directory(tmp_path, key // 100, key % 100)
+        os.makedirs(directory)
+        feather.write_feather(df.iloc[start:end].reset_index(drop=True), os.path.join(directory, 'part-0.feather'), compression='uncompressed')
+
+    os.replace(tmp_path, os.path.join(path, version))
+
+    # the version served changes in one step, readers see the old or the new one and never a missing directory.
+    # The previous version stays for the readers still on it, older ones are removed
+    previous = read_cube_version(path)
+    pointer_path = os.path.join(path, 'CURRENT.' + str(os.getpid()) + '.tmp')
+    with open(pointer_path, 'w') as file:
+        file.write(version)
+    os.replace(pointer_path, os.path.join(path, 'CURRENT'))
+
+    for name in os.listdir(path):
+        if (name not in [version, previous, 'CURRENT'] and not name.endswith('.tmp')):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+
+def _read_feather(path: str) -> pd:
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+def cache_is_valid() -> bool:
+    if (feather is None or not os.path.exists(SALES_CACHE) or read_cube_version(SALES_CUBE_PARTITIONS) is None or not os.path.exists(SALES_CACHE_META)):
+        return False
+
+    with open(SALES_CACHE_META) as file:
+        meta = json.load(file)
+
+    current = _source_fingerprint(SALES_CSV)
+
+    if (meta.get('transform_version') != current['transform_version'] or meta.get('size') != current['size']):
+        return False
+
+    if (meta.get('mtime_ns') == current['mtime_ns']):
+        return True
+
+    # file was touched (e.g. re-copied during deploy) - only the content hash can tell if it changed
+    if (meta.get('sha256') != _file_sha256(SALES_CSV)):
+        return False
+
+    meta['mtime_ns'] = current['mtime_ns']
+    try:
+        _write_json_atomic(SALES_CACHE_META, meta)
+    except OSError:
+        # read-only deployments - the cache is valid either way, the hash is just checked again on the next start
+        pass
+
+    return True
+
+def _transform_sales_csv() -> pd:
+    raw_df = pd.read_csv(SALES_CSV, index_col=False, dtype=data_transformation.SALES_DTYPES)
+    raw_df = data_transformation.apply_sales_schema(raw_df)
+
+    # by-store transformation is a superset of the overview/eda/forecasting ones
+    df = data_transformation.transform_sales_data_by_store(raw_df)
+    df.reset_index(drop=True, inplace=True)
+
+    return df
+
+def build_cache() -> pd:
+    if (feather is None):
+        raise ImportError("pyarrow is required to build the sales data cache")
+
+    meta = _source_fingerprint(SALES_CSV)
+    meta['sha256'] = _file_sha256(SALES_CSV)
+
+    df = _transform_sales_csv()
+    cube = data_transformation.build_sales_cube(df)
+
+    # the metadata is written last, a cache is only valid once both frames are in place
+    os.makedirs(CACHEPATH, exist_ok=True)
+    _write_feather_atomic(df, SALES_CACHE)
+    _write_month_partitions_atomic(cube, SALES_CUBE_PARTITIONS)
+    _write_json_atomic(SALES_CACHE_META, meta)
+
+    return df
+
+def _load_sales_data() -> pd:
+    if (cache_is_valid()):
+        return _read_feather(SALES_CACHE)
+
+    if (feather is None):
+        return _transform_sales_csv()
+
+    try:
+        return build_cache()
+    except OSError:
+        # read-only deployments still work, they just pay the CSV parse on every start
+        return _transform_sales_csv()
+
+def get_sales_df() -> pd:
+    # the frame is loaded and transformed once per process and shared by every page, callers must treat
+    # it (and the views below) as read-only. It is still held in full by every worker (the dropdown
+    # options, EDA and forecasting pages need it) - only the Insights queries read the month partitions
+    # of the cube
+    global _sales_df
+
+    if (_sales_df is None):
+        with _lock:
+            if (_sales_df is None):
+                _sales_df = _load_sales_data()
+
+    return _sales_df
+
+def get_data_version() -> str:
+    # identifies the sales data the app is serving, the same in every worker of the machine
+    return json.dumps(_source_fingerprint(SALES_CSV), sort_keys=True)
+
+def get_sales_cube() -> pd:
+    # daily x store x category x vendor rollup of the sales frame (see data_transformation.build_sales_cube),
+    # loaded from the cache built alongside the sales frame when possible - read-only as well
+    global _sales_cube
+
+    if (_sales_cube is None):
+        with _lock:
+            if (_sales_cube is None):
+                version = get_cube_version()
+                if (version is not None):
+                    _sales_cube = pd.concat([read_cube_partition(version, month) for month in get_cube_months(version)], ignore_index=True)
+                else:
+                    _sales_cube = data_transformation.build_sales_cube(get_sales_df())
+
+    return _sales_cube
+
+def get_cube_version() -> str:
+    # version of the partitioned cube to read, None when there is no valid cache - read on every call, so a
+    # rebuild by another process is picked up by the next query
+    version = read_cube_version(SALES_CUBE_PARTITIONS)
+    if (version is None):
+        return None
+
+    if (version not in _cube_months):
+        with _lock:
+            if (version not in _cube_months):
+                months = list_month_partitions(os.path.join(SALES_CUBE_PARTITIONS, version)) if (cache_is_valid()) else None
+                # only the current version and the one before are kept on disk
+                for old_version in list(_cube_months)[:-1]:
+                    del _cube_months[old_version]
+                _cube_months[version] = months
+
+    return version if (_cube_months[version] is not None) else None
+
+def get_cube_months(version: str) -> list():
+    # (year, month) of a version of the partitioned cube
+    return _cube_months[version]
+
+def get_cube_months_between(version: str, start_date, end_date) -> list():
+    first = (pd.Timestamp(start_date).year, pd.Timestamp(start_date).month)
+    last = (pd.Timestamp(end_date).year, pd.Timestamp(end_date).month)
+
+    return [month for month in get_cube_months(version) if (first <= month <= last)]
+
+def read_cube_partition(version: str, month: tuple()) -> pd:
+    # memory mapped, the pages of the file are shared through the page cache by every worker reading it
+    path = os.path.join(month_partition_directory(os.path.join(SALES_CUBE_PARTITIONS, version), *month), 'part-0.feather')
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True)
+
+# views used by the pages - all of them are backed by the same shared frame
+def get_overview_df() -> pd:
+    return get_sales_df()
+
+def get_by_store_df() -> pd:
+    return get_sales_df()
+
+def get_eda_df() -> pd:
+    return get_sales_df()
+
+def get_forecasting_df() -> pd:
+    return get_sales_df()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prebuild the columnar cache of the transformed sales data and its cube")
+    parser.add_argument('--force', action='store_true', help="rebuild even if the cache is up to date")
+    args = parser.parse_args(argv)
+
+    if (not args.force and cache_is_valid()):
+        print("Sales data cache is up to date: " + os.path.abspath(SALES_CACHE))
+        return 0
+
+    df = build_cache()
+    print("Built sales data cache with " + str(len(df.index)) + " rows: " + os.path.abspath(SALES_CACHE))
+    print("Built sales cube partitioned by month: " + os.path.abspath(SALES_CUBE_PARTITIONS))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+
+from . import dataset
+from .lru_cache import LRUCache
+
+# numeric columns of the exploratory pages, per liquor type - the boolean filter over the whole frame is
+# the slow part of a rebin, so each type is extracted once and reused for every bins/variable change
+_type_columns_cache = LRUCache(max_entries=64, max_bytes=512 * 1024 * 1024,
+    sizeof=lambda columns: sum(values.nbytes for values in columns.values()))
+
+def get_type_column(liquor_type: str, column: str) -> np.ndarray:
+    def extract():
+        df = dataset.get_eda_df()
+        return {'values': df.loc[df['liquor_type'] == liquor_type, column].to_numpy(dtype=float)}
+
+    return _type_columns_cache.get_or_compute((liquor_type, column), extract)['values']
+
+def nice_bin_edges(values: np.ndarray, nbins: int) -> np.ndarray:
+    # equal bins of a round size (1, 2, 2.5 or 5 times a power of ten) covering the values, about nbins
+    # of them - the same kind of bins plotly picks when it bins on the client
+    low = values.min()
+    high = values.max()
+
+    if (high <= low):
+        return np.array([low - 0.5, low + 0.5])
+
+    raw_size = (high - low) / max(nbins, 1)
+    magnitude = 10 ** np.floor(np.log10(raw_size))
+    size = magnitude * next(step for step in [1, 2, 2.5, 5, 10] if step * magnitude >= raw_size)
+
+    start = np.floor(low / size) * size
+    count = int(np.floor((high - start) / size)) + 1
+
+    return start + size * np.arange(count + 1)
+
+def histogram2d(x: np.ndarray, y: np.ndarray, nbins_x: int, nbins_y: int) -> dict():
+    # bin counts of the (x, y) pairs - z is indexed [y bin, x bin] like a heatmap
+    valid = np.isfinite(x) & np.isfinite(y)
+    x = x[valid]
+    y = y[valid]
+
+    if (len(x) == 0):
+        return {'x': np.empty(0), 'y': np.empty(0), 'z': np.empty((0, 0))}
+
+    edges_x = nice_bin_edges(x, nbins_x)
+    edges_y = nice_bin_edges(y, nbins_y)
+    counts, _, _ = np.histogram2d(x, y, bins=[edges_x, edges_y])
+
+    return {
+        'x': (edges_x[:-1] + edges_x[1:]) / 2,
+        'y': (edges_y[:-1] + edges_y[1:]) / 2,
+        'z': counts.T.astype(np.int64)
+    }
+
+def _grouped_quantile(values: np.ndarray, starts: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    # quantile of every group of a (group, value)-sorted array, interpolated the way plotly.js does
+    # for box plots (position n * q - 0.5)
+    position = np.clip(counts * q - 0.5, 0, counts - 1)
+    below = np.floor(position).astype(np.int64)
+    above = np.ceil(position).astype(np.int64)
+    fraction = position - below
+
+    return values[starts + below] * (1 - fraction) + values[starts + above] * fraction
+
+def box_statistics(df: pd, value_column: str, group_column: str, max_outliers: int = 50) -> tuple():
+    # box plot statistics of every group - quartiles and Tukey fences as plotly computes them - and up to
+    # max_outliers outliers per group, evenly spread over their range; groups come in order of first appearance
+    data = df[[group_column, value_column]].dropna()
+    codes, groups = pd.factorize(data[group_column])
+    values = data[value_column].to_numpy(dtype=float)
+
+    # one sort by group then value, every statistic is read off the sorted array
+    order = np.lexsort((values, codes))
+    codes = codes[order]
+    values = values[order]
+
+    counts = np.bincount(codes, minlength=len(groups))
+    starts = np.cumsum(counts) - counts
+
+    stats = pd.DataFrame({
+        group_column: np.asarray(groups, dtype=object),
+        'q1': _grouped_quantile(values, starts, counts, 0.25),
+        'median': _grouped_quantile(values, starts, counts, 0.5),
+        'q3': _grouped_quantile(values, starts, counts, 0.75)
+    })
+
+    iqr = (stats['q3'] - stats['q1']).to_numpy()
+    low_limit = stats['q1'].to_numpy() - 1.5 * iqr
+    high_limit = stats['q3'].to_numpy() + 1.5 * iqr
+    inside = (values >= low_limit[codes]) & (values <= high_limit[codes])
+
+    # fences are the most extreme values within 1.5 IQR of the box
+    lowerfence = np.full(len(groups), np.inf)
+    upperfence = np.full(len(groups), -np.inf)
+    np.minimum.at(lowerfence, codes[inside], values[inside])
+    np.maximum.at(upperfence, codes[inside], values[inside])
+    stats['lowerfence'] = np.minimum(lowerfence, stats['q1'].to_numpy())
+    stats['upperfence'] = np.maximum(upperfence, stats['q3'].to_numpy())
+
+    # outliers stay sorted by group and value - keep the first one of each of max_outliers equal slices
+    # of a group's outliers, and its last one
+    outlier_codes = codes[~inside]
+    outlier_values = values[~inside]
+    outlier_counts = np.bincount(outlier_codes, minlength=len(groups))
+    rank = np.arange(len(outlier_codes)) - (np.cumsum(outlier_counts) - outlier_counts)[outlier_codes]
+    count = outlier_counts[outlier_codes]
+
+    step = np.maximum(count - 1, 1) / max(max_outliers - 1, 1)
+    keep = (count <= max_outliers) | (np.floor(rank / step) > np.floor((rank - 1) / step)) | (rank == count - 1)
+
+    outliers = pd.DataFrame({
+        group_column: np.asarray(groups, dtype=object)[outlier_codes[keep]],
+        value_column: outlier_values[keep]
+    })
+
+    return stats, outliers
+
+def kde_curves(df: pd, value_column: str, group_column: str, grid_size: int = 512) -> dict():
+    # gaussian kernel density of value_column for every group on one fixed grid - the values are linearly
+    # binned onto the grid and smoothed with an FFT convolution, so the cost depends on the grid and not
+    # on the number of rows; bandwidths follow plotly's violin rule of thumb and each curve is cut to its
+    # group's soft span (NaN outside) like plotly does
+    data = df[[group_column, value_column]].dropna()
+    codes, groups = pd.factorize(data[group_column])
+    values = data[value_column].to_numpy(dtype=float)
+
+    counts = np.bincount(codes, minlength=len(groups))
+    group_values = pd.Series(values).groupby(codes)
+    std = group_values.std(ddof=0).to_numpy()
+    iqr = (group_values.quantile(0.75) - group_values.quantile(0.25)).to_numpy()
+    spread = np.where(iqr > 0, np.minimum(std, iqr / 1.349), std)
+    bandwidth = 1.059 * spread * counts ** -0.2
+
+    minimum = group_values.min().to_numpy()
+    maximum = group_values.max().to_numpy()
+    grid_low = (minimum - 2 * bandwidth).min()
+    grid_high = (maximum + 2 * bandwidth).max()
+
+    if (grid_high <= grid_low):
+        grid_low -= 0.5
+        grid_high += 0.5
+
+    grid = np.linspace(grid_low, grid_high, grid_size)
+    spacing = grid[1] - grid[0]
+
+    # narrower kernels than the grid spacing cannot be resolved on the grid (single rows and constant
+    # groups have no spread at all) - the spans use the clamped bandwidth, so each covers a few grid points
+    bandwidth = np.maximum(bandwidth, spacing)
+    low = minimum - 2 * bandwidth
+    high = maximum + 2 * bandwidth
+
+    # linear binning - every value is split between its two neighbouring grid points
+    position = (values - grid_low) / spacing
+    below = np.clip(np.floor(position).astype(np.int64), 0, grid_size - 2)
+    fraction = position - below
+    binned = np.bincount(codes * grid_size + below, weights=1 - fraction, minlength=len(groups) * grid_size) + \
+        np.bincount(codes * grid_size + below + 1, weights=fraction, minlength=len(groups) * grid_size)
+    binned = binned.reshape(len(groups), grid_size)
+
+    # convolution with each group's gaussian as a product with its fourier transform, zero padded
+    # to twice the grid so the tails do not wrap around
+    frequencies = np.fft.rfftfreq(2 * grid_size, d=spacing)
+    kernels = np.exp(-2 * (np.pi * frequencies[None, :] * bandwidth[:, None]) ** 2)
+    density = np.fft.irfft(np.fft.rfft(binned, n=2 * grid_size, axis=1) * kernels, n=2 * grid_size, axis=1)[:, :grid_size]
+    density = np.maximum(density, 0) / (counts[:, None] * spacing)
+
+    outside = (grid[None, :] < low[:, None]) | (grid[None, :] > high[:, None])
+    # the grid point nearest to each group's values is always kept
+    nearest = np.clip(np.round((minimum - grid_low) / spacing).astype(np.int64), 0, grid_size - 1)
+    outside[np.arange(len(groups)), nearest] = False
+    density[outside] = np.nan
+
+    return {'grid': grid, 'groups': list(groups), 'density': density}
+
+def stratified_sample(df: pd, group_column: str, budget: int, seed: int = 0) -> pd:
+    # random rows of df, at most budget of them, each group keeping its share of the rows (at least one row
+    # while there are fewer groups than budget, otherwise one row of each of the largest groups); seeded
+    # so the same selection always gives the same sample, and returned in the original row order
+    if (len(df.index) <= budget):
+        return df
+
+    codes, groups = pd.factorize(df[group_column])
+    counts = np.bincount(codes[codes >= 0], minlength=len(groups))
+    if (len(groups) > budget):
+        quotas = np.zeros(len(groups), dtype=np.int64)
+        quotas[np.argsort(-counts, kind='stable')[:budget]] = 1
+    else:
+        quotas = np.maximum(np.floor(counts * budget / counts.sum()), 1).astype(np.int64)
+        # the one row given to the smallest groups is taken back from the largest quotas, at most one per group
+        for _ in range(quotas.sum() - budget):
+            quotas[np.argmax(quotas)] -= 1
+
+    # shuffle, then keep the first quota rows of every group
+    permutation = np.random.default_rng(seed).permutation(len(codes))
+    permutation = permutation[codes[permutation] >= 0]
+    order = permutation[np.argsort(codes[permutation], kind='stable')]
+    sorted_codes = codes[order]
+    rank = np.arange(len(order)) - (np.cumsum(counts) - counts)[sorted_codes]
+
+    return df.iloc[np.sort(order[rank < quotas[sorted_codes]])]
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from statistics import NormalDist
+from plotly.subplots import make_subplots
+
+from .circos_helpers import holidays_df
+
+# linear model with a trend, Fourier seasonalities and a holiday regressor, solved with least squares -
+# a quick stand-in for Prophet while exploring the filters
+
+# (name, period in days, fourier order) - Prophet's weekly/yearly defaults and the monthly seasonality of the pages
+SEASONALITIES = [('weekly', 7, 3), ('monthly', 30.5, 1), ('yearly', 365.25, 10)]
+
+# ridge penalty of the seasonality and holiday coefficients (on y scaled by its maximum, like Prophet's priors) -
+# keeps the Fourier terms from overfitting the short history, the trend is not penalized
+SEASONALITY_PENALTY = 10.0
+
+holiday_dates = holidays_df['Date'].unique()
+
+# same look as fbprophet.plot.plot_plotly
+PREDICTION_COLOR = '#0072B2'
+ERROR_COLOR = 'rgba(0, 114, 178, 0.2)'
+
+def _days(dates, start: pd.Timestamp) -> np.ndarray:
+    return (pd.DatetimeIndex(dates) - start).days.to_numpy(dtype=float)
+
+def _design_matrix(dates, model: dict()) -> tuple():
+    # columns of the regression and the component each of them belongs to
+    days = _days(dates, model['start'])
+    columns = [np.ones(len(days)), days / model['t_scale']]
+    components = ['trend', 'trend']
+
+    for name, period, order in SEASONALITIES:
+        if (name in model['seasonalities']):
+            angles = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+            columns += list(np.sin(angles).T) + list(np.cos(angles).T)
+            components += [name] * (2 * order)
+
+    if (model['holidays']):
+        columns.append(np.isin(pd.DatetimeIndex(dates).normalize(), holiday_dates).astype(float))
+        components.append('holidays')
+
+    return np.column_stack(columns), np.array(components)
+
+def fit(final_df: pd, weekly_seasonality: bool, monthly_seasonality: bool, yearly_seasonality: bool, holidays: bool) -> dict():
+    start = final_df['ds'].min()
+    model = {
+        'start': start,
+        't_scale': max(_days([final_df['ds'].max()], start)[0], 1.0),
+        'seasonalities': [name for name, enabled in [('weekly', weekly_seasonality), ('monthly', monthly_seasonality), ('yearly', yearly_seasonality)] if enabled],
+        'holidays': bool(holidays),
+        'history': final_df[['ds', 'y']].reset_index(drop=True)
+    }
+
+    X, components = _design_matrix(final_df['ds'], model)
+    y = final_df['y'].to_numpy(dtype=float)
+    y_scale = np.abs(y).max() if (len(y) > 0 and np.abs(y).max() > 0) else 1.0
+
+    # ridge regression as an augmented least squares problem
+    penalty = np.diag(np.sqrt(np.where(components == 'trend', 0.0, SEASONALITY_PENALTY)))
+    coef = np.linalg.lstsq(np.vstack([X, penalty]), np.concatenate([y / y_scale, np.zeros(len(components))]), rcond=None)[0] * y_scale
+
+    model['coef'] = coef
+    model['components'] = components
+    # residual spread of the fit, used for the uncertainty interval
+    model['sigma'] = float(np.std(y - X @ coef))
+
+    return model
+
+def make_future_dataframe(model: dict(), periods: int, freq: str = 'D') -> pd:
+    # same frame as Prophet.make_future_dataframe - the history dates followed by the future ones
+    last_date = model['history']['ds'].max()
+    dates = pd.date_range(start=last_date, periods=periods + 1, freq=freq)
+    dates = dates[dates > last_date][:periods]
+
+    return pd.DataFrame({'ds': pd.concat([model['history']['ds'], pd.Series(dates)], ignore_index=True)})
+
+def predict(model: dict(), future: pd, interval_width: float) -> pd:
+    X, components = _design_matrix(future['ds'], model)
+    contributions = X * model['coef']
+
+    forecast = pd.DataFrame({'ds': future['ds'].to_numpy()})
+    forecast['trend'] = contributions[:, components == 'trend'].sum(axis=1)
+
+    for name in model['seasonalities'] + (['holidays'] if model['holidays'] else []):
+        forecast[name] = contributions[:, components == name].sum(axis=1)
+
+    forecast['additive_terms'] = contributions[:, components != 'trend'].sum(axis=1)
+    forecast['yhat'] = forecast['trend'] + forecast['additive_terms']
+
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    forecast['yhat_lower'] = forecast['yhat'] - z * model['sigma']
+    forecast['yhat_upper'] = forecast['yhat'] + z * model['sigma']
+
+    return forecast
+
+def cross_validate(final_df: pd, model: dict(), initial: int = 330, period: int = 15, horizon: int = 30) -> dict():
+    # same cutoffs as fbprophet.diagnostics.cross_validation(initial='330 days', period='15 days', horizon='30 days'),
+    # the metrics are taken over the longest 10% of the horizons like the last row of performance_metrics
+    start = final_df['ds'].min()
+    end = final_df['ds'].max()
+
+    cutoffs = []
+    cutoff = end - pd.Timedelta(days=horizon)
+    while (cutoff >= start + pd.Timedelta(days=initial)):
+        cutoffs.append(cutoff)
+        cutoff = cutoff - pd.Timedelta(days=period)
+
+    if (len(cutoffs) == 0):
+        raise ValueError("Less data than horizon after initial window. Make horizon or initial shorter.")
+
+    horizons = []
+    errors = []
+    actuals = []
+    for cutoff in cutoffs:
+        train = final_df[final_df['ds'] <= cutoff]
+        test = final_df[(final_df['ds'] > cutoff) & (final_df['ds'] <= cutoff + pd.Timedelta(days=horizon))]
+
+        cutoff_model = fit(train, 'weekly' in model['seasonalities'], 'monthly' in model['seasonalities'], 'yearly' in model['seasonalities'], model['holidays'])
+        X, _ = _design_matrix(test['ds'], cutoff_model)
+
+        horizons.append(_days(test['ds'], cutoff))
+        errors.append(test['y'].to_numpy(dtype=float) - X @ cutoff_model['coef'])
+        actuals.append(test['y'].to_numpy(dtype=float))
+
+    horizons = np.concatenate(horizons)
+    order = np.argsort(horizons, kind='stable')
+    window = max(int(0.1 * len(order)), 1)
+    last = order[-window:]
+
+    errors = np.concatenate(errors)[last]
+    actuals = np.concatenate(actuals)[last]
+
+    # days without sales have no percentage error, the MAPE is taken over the other days (NaN without any)
+    nonzero = actuals != 0
+    mape = float(np.mean(np.abs(errors[nonzero] / actuals[nonzero]))) if (nonzero.any()) else np.nan
+
+    return {'mape': mape, 'rmse': float(np.sqrt(np.mean(errors ** 2)))}
+
+def plot_forecast(model: dict(), forecast: pd) -> go.Figure:
+    fig = go.Figure()
+
+    fig.add_trace(go.Scatter(name='Actual', x=model['history']['ds'], y=model['history']['y'], mode='markers', marker=dict(color='black', size=4)))
+    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_lower'], mode='lines', line=dict(width=0), hoverinfo='skip', showlegend=False))
+    fig.add_trace(go.Scatter(name='Predicted', x=forecast['ds'], y=forecast['yhat'], mode='lines', line=dict(color=PREDICTION_COLOR, width=2),
+        fillcolor=ERROR_COLOR, fill='tonexty'))
+    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_upper'], mode='lines', line=dict(width=0), fillcolor=ERROR_COLOR, fill='tonexty',
+        hoverinfo='skip', showlegend=False))
+
+    fig.update_layout(showlegend=False)
+
+    return fig
+
+def plot_components(model: dict(), forecast: pd) -> go.Figure:
+    # trend and holidays over the forecast dates, the seasonalities over one of their periods
+    # like fbprophet.plot.plot_components_plotly
+    panels = [('trend', forecast['ds'], forecast['trend'])]
+
+    if (model['holidays']):
+        panels.append(('holidays', forecast['ds'], forecast['holidays']))
+
+    for name, period, _ in SEASONALITIES:
+        if (name in model['seasonalities']):
+            if (name == 'weekly'):
+                # a full week starting on Sunday
+                days = pd.date_range(model['start'] - pd.Timedelta(days=(model['start'].dayofweek + 1) % 7), periods=7, freq='D')
+                x = days.day_name()
+            elif (name == 'monthly'):
+                days = pd.date_range(model['start'], periods=int(np.ceil(period)), freq='D')
+                x = np.arange(1, len(days) + 1)
+            else:
+                days = pd.date_range(pd.Timestamp(year=model['start'].year, month=1, day=1), periods=int(period), freq='D')
+                x = days
+
+            X, components = _design_matrix(days, model)
+            panels.append((name, x, (X * model['coef'])[:, components == name].sum(axis=1)))
+
+    fig = make_subplots(rows=len(panels), cols=1)
+    for row, (name, x, y) in enumerate(panels, start=1):
+        fig.add_trace(go.Scatter(name=name, x=x, y=y, mode='lines', line=dict(color=PREDICTION_COLOR, width=2)), row=row, col=1)
+        fig.update_yaxes(title_text=name, row=row, col=1)
+
+    fig.update_layout(showlegend=False)
+
+    return fig
@@ -0,0 +1,53 @@
+import json
+import functools
+import dash
+from plotly.io.json import to_json_plotly
+
+from .lru_cache import LRUCache
+
+# serialized outputs of the figure callbacks, keyed on the callback and its normalized inputs -
+# shared by every session of the worker, bounded by the size of the JSON kept
+_figure_cache = LRUCache(max_entries=512, max_bytes=256 * 1024 * 1024, sizeof=len)
+
+def _normalize(value):
+    # hashable form of the callback inputs (dropdowns send lists, stores send dicts)
+    if (isinstance(value, (list, tuple))):
+        return tuple(_normalize(item) for item in value)
+
+    if (isinstance(value, dict)):
+        return tuple(sorted((key, _normalize(item)) for key, item in value.items()))
+
+    return value
+
+def _has_no_update(result) -> bool:
+    if (isinstance(result, (list, tuple))):
+        return any(item is dash.no_update for item in result)
+
+    return result is dash.no_update
+
+def cached_figures(func):
+    # decorator for callbacks whose outputs only depend on their inputs - a repeated request gets the
+    # stored JSON back, skipping the pandas work and plotly's validation and serialization of the figures
+    name = func.__module__ + '.' + func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        key = (name, _normalize(args))
+
+        payload = _figure_cache.get(key)
+        if (payload is None):
+            result = func(*args)
+
+            # partial updates are cheap to recompute and cannot be represented as JSON
+            if (_has_no_update(result)):
+                return result
+
+            payload = to_json_plotly(result)
+            _figure_cache.put(key, payload)
+
+        return json.loads(payload)
+
+    return wrapper
+
+def cache_info() -> dict():
+    return _figure_cache.info()
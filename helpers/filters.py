@@ -0,0 +1,149 @@
+import threading
+import numpy as np
+import pandas as pd
+
+from . import dataset
+from .lru_cache import LRUCache
+
+# (dropdown column, position of its selection in the normalized filter key)
+INSIGHTS_DROPDOWN_COLUMNS = [('county', 2), ('city', 3), ('category_name', 4), ('vendor_name', 5)]
+
+# row positions of the filtered frames, per month partition of the cube version - shared by every Insights callback and session of the worker
+_positions_cache = LRUCache(max_entries=128, max_bytes=256 * 1024 * 1024,
+    sizeof=lambda positions: sum(part_positions.nbytes for part_positions in positions.values()))
+
+# month partitions of the cube with their filter index - the categories and string columns of the frames are
+# counted in full, although the numeric columns are memory mapped
+_partitions_cache = LRUCache(max_entries=256, max_bytes=1024 * 1024 * 1024,
+    sizeof=lambda partition: int(partition['df'].memory_usage(deep=True).sum()) + sum(positions.nbytes for _, positions, _ in partition['index']['columns'].values()))
+
+_index_lock = threading.Lock()
+_insights_index = None
+
+def _codes_and_categories(values):
+    if (isinstance(values.dtype, pd.CategoricalDtype)):
+        return values.cat.codes.to_numpy(), values.cat.categories
+
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques)
+
+def build_filter_index(df: pd, columns: list()) -> dict():
+    # inverted index of a date-sorted frame: for every value of every column, the sorted row
+    # positions holding it (stored back to back in one array, sliced through offsets)
+    if (not df['Date'].is_monotonic_increasing):
+        raise ValueError("the frame has to be sorted by Date to be indexed")
+
+    position_dtype = np.int32 if len(df.index) < np.iinfo(np.int32).max else np.int64
+    index = {'dates': df['Date'].to_numpy(), 'columns': {}}
+
+    for column in columns:
+        codes, categories = _codes_and_categories(df[column])
+
+        # stable sort keeps the positions of each value in ascending order, missing values (-1) come first
+        positions = np.argsort(codes, kind='stable').astype(position_dtype)
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        offsets = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+
+        index['columns'][column] = (categories, positions, offsets)
+
+    return index
+
+def query_filter_index(index: dict(), start_date, end_date, selections: list()) -> np:
+    # the frame is date-sorted, so the date range is one slice [low, high) of row positions
+    # and every per-value position list can be cut to it with a binary search too
+    low = np.searchsorted(index['dates'], np.datetime64(start_date), side='left')
+    high = np.searchsorted(index['dates'], np.datetime64(end_date), side='right')
+
+    result = None
+    for column, values in selections:
+        if (len(values) == 0):
+            continue
+
+        categories, positions, offsets = index['columns'][column]
+        codes = categories.get_indexer(list(values))
+
+        parts = []
+        for code in codes[codes >= 0]:
+            value_positions = positions[offsets[code]:offsets[code + 1]]
+            parts.append(value_positions[np.searchsorted(value_positions, low):np.searchsorted(value_positions, high)])
+
+        # a row holds a single value per column, so the union of the selected values is disjoint
+        column_positions = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=positions.dtype)
+
+        if (result is None):
+            result = column_positions
+        else:
+            result = np.intersect1d(result, column_positions, assume_unique=True)
+
+    if (result is None):
+        result = np.arange(low, high)
+
+    return result
+
+def _get_insights_index() -> dict():
+    global _insights_index
+
+    if (_insights_index is None):
+        with _index_lock:
+            if (_insights_index is None):
+                _insights_index = build_filter_index(dataset.get_sales_cube(), [column for column, _ in INSIGHTS_DROPDOWN_COLUMNS])
+
+    return _insights_index
+
+def _get_partition(part: tuple()) -> dict():
+    # part is (cube version, (year, month))
+    def load():
+        df = dataset.read_cube_partition(*part)
+        return {'df': df, 'index': build_filter_index(df, [column for column, _ in INSIGHTS_DROPDOWN_COLUMNS])}
+
+    return _partitions_cache.get_or_compute(part, load)
+
+def _get_part(part) -> dict():
+    # None is the whole cube in memory, used when the cube is not partitioned on disk
+    if (part is None):
+        return {'df': dataset.get_sales_cube(), 'index': _get_insights_index()}
+
+    return _get_partition(part)
+
+def _get_parts(version: str, start_date, end_date) -> list():
+    if (version is None):
+        return [None]
+
+    # only the months overlapping the date range are read - a range outside the data still
+    # needs one (empty) slice of a month to get the columns
+    months = dataset.get_cube_months_between(version, start_date, end_date) or dataset.get_cube_months(version)[:1]
+    return [(version, month) for month in months]
+
+def _normalize_selection(values) -> tuple():
+    # None and [] both mean "no filter", the order of the selected options does not matter
+    if (not values):
+        return ()
+
+    return tuple(sorted(set(values)))
+
+def normalize_insights_filters(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown) -> tuple():
+    return (
+        pd.Timestamp(start_date),
+        pd.Timestamp(end_date),
+        _normalize_selection(county_dropdown),
+        _normalize_selection(city_dropdown),
+        _normalize_selection(category_dropdown),
+        _normalize_selection(vendor_dropdown)
+    )
+
+def _filter_positions(version: str, key: tuple()) -> dict():
+    selections = [(column, key[key_position]) for column, key_position in INSIGHTS_DROPDOWN_COLUMNS]
+    return {part: query_filter_index(_get_part(part)['index'], key[0], key[1], selections) for part in _get_parts(version, key[0], key[1])}
+
+def filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown) -> pd:
+    # date range + dropdown filters of the Insights settings menu, memoized on the normalized selection -
+    # answered from the sales cube, so the result holds pre-summed cells (with an 'orders' count) rather than invoice lines
+    key = normalize_insights_filters(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
+    # a rebuilt cube is a new version, the positions of the old one are never served for it
+    version = dataset.get_cube_version()
+    positions = _positions_cache.get_or_compute((version, key), lambda: _filter_positions(version, key))
+
+    return pd.concat([_get_part(part)['df'].iloc[part_positions] for part, part_positions in positions.items()], ignore_index=True)
+
+def cache_info() -> dict():
+    return {'positions': _positions_cache.info(), 'partitions': _partitions_cache.info()}
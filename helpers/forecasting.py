@@ -0,0 +1,544 @@
+import os
+import sys
+import copy
+import time
+import json
+import hashlib
+import argparse
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from fbprophet import Prophet
+from fbprophet.serialize import model_to_json, model_from_json
+from fbprophet.diagnostics import cross_validation, performance_metrics
+
+import utils
+from . import dataset, daily_series, fast_forecasting
+from .lru_cache import LRUCache
+
+DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
+# fitted models are shared by the workers of the machine through local disk
+MODELPATH = os.path.join(DATAPATH, "cache", "prophet")
+# the disk store of models and metrics keeps the most recently used keys up to this size
+MODEL_STORE_MAX_BYTES = 1024 * 1024 * 1024
+# optimizer starting points of the fitted models, grouped by training dates and model settings
+WARMSTARTPATH = os.path.join(MODELPATH, "warm_start")
+# a stored fit is only used as starting point for series this close to its own (RMS difference of the
+# series scaled by their maximum) - starting from a far away optimum takes more iterations than the default
+WARM_START_MAX_DISTANCE = 0.05
+# stored starting points kept per group, the oldest are dropped first
+WARM_START_MAX_PER_GROUP = 16
+# forecasts of every segment written by the batch run (python -m helpers.forecasting)
+BATCH_FORECASTS = os.path.join(DATAPATH, "cache", "forecasts.parquet")
+# columns of the batch results that are not part of the Prophet forecast frame
+BATCH_COLUMNS = ['liquor_type', 'vendor_name', 'variable', 'interval_width', 'mape', 'rmse', 'model_key', 'fit', 'fit_seconds']
+
+FORECAST_VARIABLES = ['bottles_sold', 'volume_sold_liters']
+# same defaults as the model parameters card of the forecasting pages
+BATCH_SETTINGS = {
+    'num_months_to_predict': 12,
+    'conf_interval': 95,
+    'weekly_seasonality': True,
+    'monthly_seasonality': True,
+    'yearly_seasonality': True,
+    'holidays': True
+}
+
+# in-memory layers in front of the disk store, filled by the page callbacks of the long-lived app workers -
+# background jobs and batch processes only live for one fit, they read and write the disk store alone
+# fitted models - one entry per training series and seasonality/holiday settings
+_model_cache = LRUCache(max_entries=32)
+# forecasts of the fitted models - one entry per model, interval width, horizon and frequency
+_forecast_cache = LRUCache(max_entries=64)
+# cross-validation metrics of the fitted models
+_metrics_cache = LRUCache(max_entries=256)
+_disk_lock = threading.Lock()
+
+# forecasts of the last batch run by model key, with the modification time of the file they were read from
+_batch_forecasts = (None, {})
+_batch_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+def _series_fingerprint(final_df: pd) -> str:
+    digest = hashlib.sha256()
+    digest.update(final_df['ds'].to_numpy().astype('datetime64[ns]').tobytes())
+    digest.update(final_df['y'].to_numpy(dtype=float).tobytes())
+
+    return digest.hexdigest()
+
+def _cache_key(final_df: pd, model_params: dict()) -> str:
+    # the training data is identified by its content, so equal series coming from different
+    # filter selections share a model too
+    params = json.dumps(model_params, sort_keys=True)
+    return hashlib.sha256((_series_fingerprint(final_df) + params).encode()).hexdigest()
+
+def build_model(weekly_seasonality: bool, monthly_seasonality: bool, yearly_seasonality: bool, holidays: bool) -> Prophet:
+    model = Prophet(weekly_seasonality=weekly_seasonality, yearly_seasonality=yearly_seasonality, changepoint_prior_scale=0.1)
+
+    if (monthly_seasonality):
+        model.add_seasonality(name='monthly', period=30.5, fourier_order=1)
+
+    if (holidays):
+        model.add_country_holidays(country_name='US')
+
+    return model
+
+def _cross_validate(model: Prophet, parallel: str = 'processes') -> dict():
+    # the cutoff refits are independent of each other, so by default they run on a process pool
+    df_cv = cross_validation(model, initial='330 days', period='15 days', horizon = '30 days', parallel=parallel)
+    df_p = performance_metrics(df_cv)
+
+    return {'mape': df_p['mape'].tolist()[-1], 'rmse': df_p['rmse'].tolist()[-1]}
+
+def _touch(path: str):
+    # the modification time of a stored file marks its last use (atime is not reliable, e.g. noatime mounts)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _evict_model_store():
+    # drops the least recently used keys (model and metrics files together) until the store fits in MODEL_STORE_MAX_BYTES
+    entries = {}
+    for entry in os.scandir(MODELPATH):
+        if (not entry.is_file() or entry.name.endswith('.tmp')):
+            continue
+
+        stat = entry.stat()
+        key = entry.name.split('.')[0]
+        size, last_used, paths = entries.get(key, (0, 0, []))
+        entries[key] = (size + stat.st_size, max(last_used, stat.st_mtime), paths + [entry.path])
+
+    total = sum(size for size, _, _ in entries.values())
+    for size, _, paths in sorted(entries.values(), key=lambda entry: entry[1]):
+        if (total <= MODEL_STORE_MAX_BYTES):
+            break
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+
+def _read_model_from_disk(key: str) -> Prophet:
+    path = os.path.join(MODELPATH, key + '.json')
+    try:
+        with open(path) as file:
+            model = model_from_json(file.read())
+    except (OSError, ValueError):
+        return None
+
+    _touch(path)
+    return model
+
+def _write_model_to_disk(key: str, model: Prophet):
+    try:
+        with _disk_lock:
+            os.makedirs(MODELPATH, exist_ok=True)
+            tmp_path = os.path.join(MODELPATH, key + '.json.' + str(os.getpid()) + '.tmp')
+            with open(tmp_path, 'w') as file:
+                file.write(model_to_json(model))
+            os.replace(tmp_path, os.path.join(MODELPATH, key + '.json'))
+            _evict_model_store()
+    except OSError:
+        # the disk store is an optimisation, the in-memory cache still holds the model
+        pass
+
+def _read_metrics_from_disk(key: str) -> dict():
+    path = os.path.join(MODELPATH, key + '.metrics.json')
+    try:
+        with open(path) as file:
+            metrics = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    _touch(path)
+    return metrics
+
+def _write_metrics_to_disk(key: str, metrics: dict()):
+    try:
+        with _disk_lock:
+            os.makedirs(MODELPATH, exist_ok=True)
+            tmp_path = os.path.join(MODELPATH, key + '.metrics.json.' + str(os.getpid()) + '.tmp')
+            with open(tmp_path, 'w') as file:
+                json.dump(metrics, file)
+            os.replace(tmp_path, os.path.join(MODELPATH, key + '.metrics.json'))
+            _evict_model_store()
+    except OSError:
+        pass
+
+def _model_params(weekly_seasonality: bool, monthly_seasonality: bool, yearly_seasonality: bool, holidays: bool) -> dict():
+    return {
+        'weekly_seasonality': bool(weekly_seasonality),
+        'monthly_seasonality': bool(monthly_seasonality),
+        'yearly_seasonality': bool(yearly_seasonality),
+        'holidays': bool(holidays)
+    }
+
+def _warm_start_group(final_df: pd, model_params: dict()) -> str:
+    # the changepoints and holiday features of a model only depend on the training dates, so models
+    # fitted on the same dates with the same settings have parameters of the same shapes
+    digest = hashlib.sha256()
+    digest.update(final_df['ds'].to_numpy().astype('datetime64[ns]').tobytes())
+    digest.update(json.dumps(model_params, sort_keys=True).encode())
+
+    return digest.hexdigest()
+
+def _scaled_series(final_df: pd) -> np.ndarray:
+    # Prophet fits y scaled by its maximum, series are compared on that scale
+    y = final_df['y'].to_numpy(dtype=float)
+    scale = np.abs(y).max() if (len(y) > 0) else 0
+
+    return y / scale if (scale > 0) else y
+
+def _stan_init(model: Prophet) -> dict():
+    # fitted parameters in the form Prophet.fit(init=...) expects them
+    init = {name: float(model.params[name][0][0]) for name in ['k', 'm', 'sigma_obs']}
+    init.update({name: np.asarray(model.params[name][0], dtype=float) for name in ['delta', 'beta']})
+
+    return init
+
+def _read_warm_start_index(directory: str) -> tuple():
+    # keys of the stored starting points of a group, oldest first, and their scaled training series
+    try:
+        with np.load(os.path.join(directory, 'index.npz')) as index:
+            return list(index['keys']), index['y_scaled']
+    except (OSError, ValueError, KeyError):
+        return [], None
+
+def _find_warm_start(group: str, y_scaled: np.ndarray) -> dict():
+    # starting point of the stored fit whose (scaled) training series is the closest to this one - the
+    # distances are taken on the group's index, only the chosen starting point is read
+    directory = os.path.join(WARMSTARTPATH, group)
+    keys, series = _read_warm_start_index(directory)
+    if (len(keys) == 0 or series.shape[1:] != y_scaled.shape):
+        return None
+
+    distances = np.sqrt(np.mean((series - y_scaled) ** 2, axis=1))
+    best = int(np.argmin(distances))
+    if (distances[best] > WARM_START_MAX_DISTANCE):
+        return None
+
+    try:
+        with np.load(os.path.join(directory, keys[best] + '.npz')) as candidate:
+            init = {param: candidate[param] for param in ['k', 'm', 'sigma_obs', 'delta', 'beta']}
+    except (OSError, ValueError, KeyError):
+        return None
+
+    for param in ['k', 'm', 'sigma_obs']:
+        init[param] = float(init[param])
+
+    return init
+
+def _write_warm_start(group: str, key: str, y_scaled: np.ndarray, model: Prophet):
+    try:
+        directory = os.path.join(WARMSTARTPATH, group)
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_path = os.path.join(directory, key + '.' + str(os.getpid()) + '.tmp')
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, **_stan_init(model))
+        os.replace(tmp_path, os.path.join(directory, key + '.npz'))
+
+        with _disk_lock:
+            keys, series = _read_warm_start_index(directory)
+            if (series is None or series.shape[1:] != y_scaled.shape):
+                keys, series = [], np.empty((0,) + y_scaled.shape)
+
+            kept = [position for position, stored_key in enumerate(keys) if (stored_key != key)][-(WARM_START_MAX_PER_GROUP - 1):]
+            keys = [keys[position] for position in kept] + [key]
+            series = np.vstack([series[kept], y_scaled[None, :]])
+
+            tmp_path = os.path.join(directory, 'index.' + str(os.getpid()) + '.tmp')
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, keys=np.array(keys), y_scaled=series)
+            os.replace(tmp_path, os.path.join(directory, 'index.npz'))
+
+            # starting points dropped from the index (or lost to a concurrent index update) are removed
+            for name in os.listdir(directory):
+                if (name.endswith('.npz') and name != 'index.npz' and name[:-len('.npz')] not in keys):
+                    os.remove(os.path.join(directory, name))
+    except OSError:
+        pass
+
+def _fit(final_df: pd, model_params: dict(), init: dict()) -> Prophet:
+    model = build_model(**model_params)
+
+    start = time.perf_counter()
+    if (init is None):
+        model.fit(final_df)
+    else:
+        model.fit(final_df, init=init)
+
+    # pystan's optimizer does not report its iterations, the fit time is what shows the saving of a warm start -
+    # kept on the fitted model (not in the stored one) and logged
+    model.fit_stats = {'fit': 'cold' if init is None else 'warm', 'seconds': time.perf_counter() - start}
+    logger.info("%s Prophet fit took %.2fs", model.fit_stats['fit'], model.fit_stats['seconds'])
+
+    # cross_validation refits the cutoffs with the kwargs of the fit, the starting point only suits
+    # this training series
+    model.fit_kwargs = {}
+
+    return model
+
+def find_model(final_df: pd, model_params: dict(), keep_in_memory: bool = True) -> tuple():
+    # model already fitted on the training series with these settings, from memory then from the local
+    # disk store - (key, None) when it was never fitted (or was dropped from the store)
+    key = _cache_key(final_df, model_params)
+
+    model = _model_cache.get(key)
+    if (model is None):
+        model = _read_model_from_disk(key)
+        if (model is not None and keep_in_memory):
+            _model_cache.put(key, model)
+
+    return key, model
+
+def fit_model(final_df: pd, model_params: dict(), progress=None, keep_in_memory: bool = True) -> tuple():
+    # fit stage - only the training series and the seasonality/holiday settings change the fitted
+    # parameters, the model is served from memory, then from the local disk store, and only fitted
+    # when neither has it. New fits start from the parameters of the closest series already fitted
+    # on the same dates with the same settings
+    key, model = find_model(final_df, model_params, keep_in_memory)
+
+    if (model is None):
+        if (progress is not None):
+            progress("Fitting the model...")
+
+        group = _warm_start_group(final_df, model_params)
+        y_scaled = _scaled_series(final_df)
+        init = _find_warm_start(group, y_scaled)
+
+        try:
+            model = _fit(final_df, model_params, init)
+        except (RuntimeError, ValueError):
+            if (init is None):
+                raise
+            # the starting point did not suit the optimizer, fit from Prophet's default one
+            model = _fit(final_df, model_params, None)
+
+        _write_model_to_disk(key, model)
+        _write_warm_start(group, key, y_scaled, model)
+        if (keep_in_memory):
+            _model_cache.put(key, model)
+
+    return key, model
+
+def find_cv_metrics(key: str, keep_in_memory: bool = True) -> dict():
+    metrics = _metrics_cache.get(key)
+    if (metrics is None):
+        metrics = _read_metrics_from_disk(key)
+        if (metrics is not None and keep_in_memory):
+            _metrics_cache.put(key, metrics)
+
+    return metrics
+
+def get_cv_metrics(key: str, model: Prophet, progress=None, parallel: str = 'processes', keep_in_memory: bool = True) -> dict():
+    # MAPE/RMSE only depend on the point forecasts of the cutoff fits, so they are stored per fitted
+    # model - the interval width and the number of months to predict never re-run the CV
+    metrics = find_cv_metrics(key, keep_in_memory)
+
+    if (metrics is None):
+        if (progress is not None):
+            progress("Cross-validating the model...")
+
+        metrics = _cross_validate(model, parallel)
+        _write_metrics_to_disk(key, metrics)
+        if (keep_in_memory):
+            _metrics_cache.put(key, metrics)
+
+    return metrics
+
+def fit_and_validate(final_df: pd, weekly_seasonality: bool, monthly_seasonality: bool, yearly_seasonality: bool, holidays: bool, progress=None) -> str:
+    # the slow stages of a Prophet forecast - run as a background job, the model and metrics reach the
+    # pages through the disk store
+    key, model = fit_model(final_df, _model_params(weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays), progress, keep_in_memory=False)
+    get_cv_metrics(key, model, progress, keep_in_memory=False)
+
+    return key
+
+def with_interval_width(model: Prophet, interval_width: float) -> Prophet:
+    # the interval width is only used when sampling the uncertainty of a prediction, a shallow copy
+    # keeps the cached model untouched for the other requests
+    model = copy.copy(model)
+    model.interval_width = interval_width
+
+    return model
+
+def _predict(model: Prophet, interval_width: float, periods_to_predict: int, freq: str = 'D') -> pd:
+    future = model.make_future_dataframe(periods=periods_to_predict, freq=freq)
+    return with_interval_width(model, interval_width).predict(future)
+
+def predict(key: str, model: Prophet, interval_width: float, periods_to_predict: int, freq: str = 'D') -> pd:
+    # predict stage - reuses the fitted parameters, the horizon and the interval width only change
+    # the future frame and the uncertainty sampling
+    return _forecast_cache.get_or_compute((key, interval_width, periods_to_predict, freq), lambda: _predict(model, interval_width, periods_to_predict, freq))
+
+def get_fast_forecast(final_df: pd, interval_width: float, periods_to_predict: int, model_params: dict()) -> dict():
+    # least squares fits take milliseconds, nothing is cached
+    model = fast_forecasting.fit(final_df, **model_params)
+    future = fast_forecasting.make_future_dataframe(model, periods_to_predict, freq='D')
+
+    result = {'model': model, 'forecast': fast_forecasting.predict(model, future, interval_width)}
+    result.update(fast_forecasting.cross_validate(final_df, model))
+
+    return result
+
+def get_forecast(final_df: pd, num_months_to_predict: int, conf_interval: int, weekly_seasonality: bool, monthly_seasonality: bool, yearly_seasonality: bool, holidays: bool, engine: str = 'prophet', fit: bool = True, progress=None) -> dict():
+    # fitted model (with the requested interval width), daily forecast and cross-validation metrics
+    # for a training series - progress is called with a short message before each of the slow stages.
+    # With fit=False a Prophet forecast is only made from a stored model and metrics, None when they are not stored yet
+    interval_width = conf_interval / 100
+    periods_to_predict = int(round(num_months_to_predict * 30.5))
+    model_params = _model_params(weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays)
+
+    if (engine == 'fast'):
+        return get_fast_forecast(final_df, interval_width, periods_to_predict, model_params)
+
+    if (fit):
+        key, model = fit_model(final_df, model_params, progress)
+        metrics = get_cv_metrics(key, model, progress)
+    else:
+        key, model = find_model(final_df, model_params)
+        metrics = None if (model is None) else find_cv_metrics(key)
+        if (metrics is None):
+            return None
+
+    # the batch run already predicted the default settings of the segments it covers
+    forecast = find_batch_forecast(key, interval_width, periods_to_predict, len(model.history.index))
+
+    result = {
+        'key': key,
+        'model': with_interval_width(model, interval_width),
+        'forecast': predict(key, model, interval_width, periods_to_predict) if (forecast is None) else forecast
+    }
+    result.update(metrics)
+
+    return result
+
+def get_segments(top_vendors: int) -> list():
+    # every liquor type on its own and the top vendors by sales on their own, as (liquor_type, vendor_name)
+    df = dataset.get_forecasting_df()
+
+    liquor_types = utils.get_unique_values(df, 'liquor_type')
+    vendors = df.groupby('vendor_name', observed=True)['sale_dollars'].sum().nlargest(top_vendors).index.tolist()
+
+    return [(liquor_type, None) for liquor_type in liquor_types] + [(None, vendor) for vendor in vendors]
+
+def forecast_segment(liquor_type: str, vendor_name: str, var_to_forecast: str, final_df: pd, settings: dict() = BATCH_SETTINGS) -> pd:
+    interval_width = settings['conf_interval'] / 100
+    periods_to_predict = int(round(settings['num_months_to_predict'] * 30.5))
+    model_params = _model_params(settings['weekly_seasonality'], settings['monthly_seasonality'], settings['yearly_seasonality'], settings['holidays'])
+
+    # the segments already run in parallel, the cross-validation of each one stays in its process
+    key, model = fit_model(final_df, model_params, keep_in_memory=False)
+    forecast = _predict(model, interval_width, periods_to_predict)
+    metrics = get_cv_metrics(key, model, parallel=None, keep_in_memory=False)
+
+    # the whole forecast frame is kept, components included, so the pages can plot it as it is
+    results = forecast.copy()
+    results.insert(0, 'liquor_type', liquor_type)
+    results.insert(1, 'vendor_name', vendor_name)
+    results.insert(2, 'variable', var_to_forecast)
+    results['interval_width'] = interval_width
+    results['mape'] = metrics['mape']
+    results['rmse'] = metrics['rmse']
+    results['model_key'] = key
+    # how the model was obtained - 'cold' or 'warm' started fit, or 'stored' when it was already fitted
+    fit_stats = getattr(model, 'fit_stats', {'fit': 'stored', 'seconds': np.nan})
+    results['fit'] = fit_stats['fit']
+    results['fit_seconds'] = fit_stats['seconds']
+
+    return results
+
+def _forecast_segment_task(task: tuple()) -> pd:
+    return forecast_segment(*task)
+
+def run_batch(top_vendors: int = 10, workers: int = None) -> pd:
+    # fits go through the same model and metrics stores as the pages, so a page showing one of the
+    # batch segments with the default settings finds its model and metrics already in place
+    # the training series are summed from the daily series store once, here, and handed to the pool
+    tasks = list()
+    for liquor_type, vendor_name in get_segments(top_vendors):
+        for variable in FORECAST_VARIABLES:
+            final_df = daily_series.get_training_series(None if liquor_type is None else [liquor_type], None if vendor_name is None else [vendor_name], variable)['series']
+            tasks.append((liquor_type, vendor_name, variable, final_df))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = pd.concat(list(executor.map(_forecast_segment_task, tasks)), ignore_index=True)
+
+    os.makedirs(os.path.dirname(BATCH_FORECASTS), exist_ok=True)
+    tmp_path = BATCH_FORECASTS + '.' + str(os.getpid()) + '.tmp'
+    results.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, BATCH_FORECASTS)
+
+    return results
+
+def read_batch_forecasts() -> pd:
+    return pd.read_parquet(BATCH_FORECASTS)
+
+def _get_batch_forecasts() -> dict():
+    # read again when a new batch run replaced the file, empty when there is none
+    global _batch_forecasts
+
+    try:
+        mtime_ns = os.stat(BATCH_FORECASTS).st_mtime_ns
+    except OSError:
+        return {}
+
+    if (_batch_forecasts[0] != mtime_ns):
+        with _batch_lock:
+            if (_batch_forecasts[0] != mtime_ns):
+                try:
+                    results = read_batch_forecasts()
+                except (OSError, ValueError):
+                    results = None
+
+                forecasts = dict()
+                # files of older runs lack some of the columns, they are not served
+                if (results is not None and set(BATCH_COLUMNS) <= set(results.columns)):
+                    # segments with the same training series share a model key (and a forecast)
+                    for key, forecast in results.drop_duplicates(['model_key', 'ds']).groupby('model_key', sort=False):
+                        forecasts[key] = {
+                            'interval_width': forecast['interval_width'].iloc[0],
+                            # holiday columns of the other segments are empty
+                            'forecast': forecast.drop(columns=BATCH_COLUMNS).dropna(axis=1, how='all').reset_index(drop=True)
+                        }
+
+                _batch_forecasts = (mtime_ns, forecasts)
+
+    return _batch_forecasts[1]
+
+def find_batch_forecast(key: str, interval_width: float, periods_to_predict: int, history_rows: int) -> pd:
+    # forecast of the model written by the batch run, cut to the horizon - None when the batch did not cover
+    # the model, or predicted another interval width or a shorter horizon
+    batch = _get_batch_forecasts().get(key)
+    if (batch is None or batch['interval_width'] != interval_width or len(batch['forecast'].index) < history_rows + periods_to_predict):
+        return None
+
+    return batch['forecast'].iloc[:history_rows + periods_to_predict]
+
+def cache_info() -> dict():
+    return {'models': _model_cache.info(), 'forecasts': _forecast_cache.info(), 'metrics': _metrics_cache.info()}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Forecast every liquor type and the top vendors with the default model settings")
+    parser.add_argument('--top-vendors', type=int, default=10, help="number of vendors (by sales) to forecast")
+    parser.add_argument('--workers', type=int, default=None, help="size of the process pool (defaults to the number of CPUs)")
+    args = parser.parse_args(argv)
+
+    results = run_batch(args.top_vendors, args.workers)
+    print("Forecasted " + str(len(results.groupby(['liquor_type', 'vendor_name', 'variable'], dropna=False))) + " segments: " + os.path.abspath(BATCH_FORECASTS))
+
+    fits = results.drop_duplicates('model_key').groupby('fit')['fit_seconds']
+    for fit, seconds in fits:
+        print(str(len(seconds)) + " " + fit + " fits" + ("" if fit == 'stored' else ", " + "{:.2f}".format(seconds.mean()) + "s on average"))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import os
+import sys
+import shutil
+import argparse
+import pandas as pd
+
+from . import dataset, data_transformation, daily_series
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# transformed sales data of any size, one parquet file per month and chunk of rows that covers it:
+# <PARTITIONS_PATH>/year=2021/month=3/part-<chunk>.parquet
+PARTITIONS_PATH = os.path.join(dataset.CACHEPATH, "sales_partitions")
+# daily series of every (liquor_type, vendor_name) segment of the ingested rows (see helpers.daily_series), next to
+# the partitions - the leading underscore keeps it out of the parquet dataset
+DAILY_SERIES_FILE = '_daily_series.npz'
+PARTITION_COLUMNS = ['year', 'month']
+
+# rows read from the CSV at a time - peak memory is set by this, not by the size of the source
+CHUNKSIZE = 1000000
+
+def _arrow_schema(df: pd):
+    # one schema for every chunk - categories differ from chunk to chunk and integers are downcast per chunk,
+    # so categoricals are written as strings and integers widened
+    fields = list()
+    for column in df.columns:
+        if (column in PARTITION_COLUMNS):
+            continue
+
+        dtype = df[column].dtype
+        if (pd.api.types.is_datetime64_any_dtype(dtype)):
+            fields.append(pa.field(column, pa.timestamp('ns')))
+        elif (pd.api.types.is_bool_dtype(dtype)):
+            fields.append(pa.field(column, pa.bool_()))
+        elif (pd.api.types.is_integer_dtype(dtype)):
+            fields.append(pa.field(column, pa.int64()))
+        elif (pd.api.types.is_float_dtype(dtype)):
+            fields.append(pa.field(column, pa.float64()))
+        else:
+            fields.append(pa.field(column, pa.string()))
+
+    return pa.schema(fields)
+
+def _to_table(df: pd, schema):
+    columns = dict()
+    for field in schema:
+        values = df[field.name]
+        if (pa.types.is_string(field.type)):
+            values = values.astype(object).where(values.notna(), None)
+        columns[field.name] = values
+
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=schema, preserve_index=False)
+
+def _transform_chunk(chunk: pd) -> pd:
+    # same steps as the in-memory load (dataset._transform_sales_csv) - the by-store transformation,
+    # store location fix-ups and lat/lon included, only needs the rows of the chunk
+    chunk = data_transformation.apply_sales_schema(chunk)
+    return data_transformation.transform_sales_data_by_store(chunk)
+
+def ingest(source: str = dataset.SALES_CSV, output: str = PARTITIONS_PATH, chunksize: int = CHUNKSIZE, progress=None) -> int:
+    if (pa is None):
+        raise ImportError("pyarrow is required to write the partitioned sales data")
+
+    # built next to the output and swapped in at the end, readers never see a partial dataset
+    tmp_output = output + '.' + str(os.getpid()) + '.tmp'
+    shutil.rmtree(tmp_output, ignore_errors=True)
+
+    schema = None
+    series = None
+    rows = 0
+
+    for number, chunk in enumerate(pd.read_csv(source, index_col=False, dtype=data_transformation.SALES_DTYPES, chunksize=chunksize)):
+        chunk = _transform_chunk(chunk)
+        if (schema is None):
+            schema = _arrow_schema(chunk)
+
+        # a chunk writes (and closes) one file in every month it covers - no writer stays open across chunks,
+        # so memory and file handles are bounded by the chunk, whatever the order of the source. A month gets
+        # one file per chunk its rows appear in, a single one or two for a source sorted by date
+        for (year, month), part in chunk.groupby(PARTITION_COLUMNS, observed=True, sort=True):
+            path = dataset.month_partition_directory(tmp_output, year, month)
+            os.makedirs(path, exist_ok=True)
+            pq.write_table(_to_table(part, schema), os.path.join(path, 'part-' + str(number) + '.parquet'))
+
+        # the rows of the chunk are folded into the daily series, held for the whole run - dates x segments,
+        # whatever the number of rows
+        series = daily_series.append_rows(series, chunk)
+
+        rows += len(chunk.index)
+        if (progress is not None):
+            progress(rows)
+
+    if (series is not None):
+        daily_series.write_daily_series(series, os.path.join(tmp_output, DAILY_SERIES_FILE))
+
+    if (os.path.exists(output)):
+        old_output = output + '.' + str(os.getpid()) + '.old'
+        os.replace(output, old_output)
+        os.replace(tmp_output, output)
+        shutil.rmtree(old_output, ignore_errors=True)
+    else:
+        os.replace(tmp_output, output)
+
+    return rows
+
+def read_daily_series(output: str = PARTITIONS_PATH) -> dict():
+    return daily_series.read_daily_series(os.path.join(output, DAILY_SERIES_FILE))
+
+def read_partitions(output: str = PARTITIONS_PATH, filters: list() = None) -> pd:
+    # partitions written by ingest, e.g. filters=[('year', '=', 2021), ('month', '<=', 3)] reads those months only
+    return pq.read_table(output, filters=filters, partitioning='hive').to_pandas()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Transform a sales CSV of any size in chunks into parquet files partitioned by year and month")
+    parser.add_argument('--source', default=dataset.SALES_CSV, help="sales CSV to ingest")
+    parser.add_argument('--output', default=PARTITIONS_PATH, help="directory of the partitioned output")
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help="rows read at a time")
+    args = parser.parse_args(argv)
+
+    rows = ingest(args.source, args.output, args.chunksize, progress=lambda rows: print("Ingested " + str(rows) + " rows"))
+    print("Wrote " + str(rows) + " rows partitioned by year and month: " + os.path.abspath(args.output))
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,12 @@
-import os
 import pandas as pd
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 from dateutil.relativedelta import relativedelta
 
 import utils
-from . import data_transformation
+from . import dataset
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_overview(raw_df)
+df = dataset.get_overview_df()
 
 # parameters for date-picker
 start_date = min(df['Date'])
@@ -221,6 +217,20 @@ def radio_items_for_y_axis(radio_items_id):
 model_parameters_card = dbc.Card([ 
                             dbc.CardHeader(html.H5("Parameters to tune model", className="card-title")),
                             dbc.CardBody([ 
+                                html.P("Forecasting model"),
+
+                                dbc.RadioItems(
+                                    options=[
+                                        {"label": "Fast (linear model)", "value": "fast"},
+                                        {"label": "Accurate (Prophet)", "value": "prophet"}
+                                    ],
+                                    value="fast",
+                                    id='radio-items-forecast-engine',
+                                    persistence=True, persistence_type="local"
+                                ),
+
+                                html.Hr(),
+
                                 html.P("Variable to forecast"),
 
                                 dbc.RadioItems(
@@ -0,0 +1,99 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    # thread-safe, size-bounded LRU cache - bounded by number of entries and optionally by the
+    # total size of the values, as reported by the sizeof function
+    def __init__(self, max_entries: int, max_bytes: int = None, sizeof=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # keys being computed by get_or_compute, with the event their waiters block on
+        self._pending = dict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if (key in self._entries):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+
+        # values larger than the whole cache are not worth evicting everything else for
+        if (self.max_bytes is not None and size > self.max_bytes):
+            return
+
+        with self._lock:
+            if (key in self._entries):
+                self._bytes -= self._entries.pop(key)[1]
+
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while (len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        # single flight - concurrent misses on a key wait for the one call computing it and share its value
+        while (True):
+            with self._lock:
+                if (key in self._entries):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key][0]
+
+                pending = self._pending.get(key)
+                if (pending is None):
+                    pending = {'done': threading.Event()}
+                    self._pending[key] = pending
+                    self.misses += 1
+                    break
+
+            pending['done'].wait()
+
+            if ('value' in pending):
+                with self._lock:
+                    self.hits += 1
+                return pending['value']
+
+            # the computation raised - the next caller through computes it again
+
+        try:
+            value = compute()
+            pending['value'] = value
+            self.put(key, value)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending['done'].set()
+
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def info(self) -> dict():
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
@@ -1,13 +1,14 @@
-import os
 import dash
-import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State, callback
 from dash_bootstrap_templates import load_figure_template
 
 import utils
-from helpers import layout_helpers
+from helpers import layout_helpers, dataset, eda_stats, figure_cache
 
 dash.register_page(
     __name__,
@@ -18,9 +19,13 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
+# the scatter matrix plots every row up to SCATTER_MATRIX_POINTS rows, a sample stratified by liquor type of that
+# many rows up to SCATTER_MATRIX_SAMPLE_ROWS rows, and binned density panels above that
+SCATTER_MATRIX_POINTS = 20000
+SCATTER_MATRIX_SAMPLE_ROWS = 500000
+SCATTER_MATRIX_BINS = 30
 
-df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
+df = dataset.get_eda_df()
 
 layout = html.Div([ 
     layout_helpers.eda_get_subheader("eda-bivariate-info-btn"),
@@ -77,6 +82,7 @@ layout = html.Div([
         ], width=2, className="ms-3 dbc"),
 
         dbc.Col([ 
+            html.P(id="scatter-matrix-mode", className="text-muted"),
             dbc.Spinner(children=[dcc.Graph(id='scatter-matrix-graph')], color='primary')
         ], width=9, className="ms-3")
     ]),
@@ -174,13 +180,49 @@ def toggle_modal(n_clicks, is_open):
         return not is_open
     return is_open
 
+def get_density_matrix(final, dimensions):
+    # scatter matrix as binned counts - histograms on the diagonal, log-scaled 2D histograms elsewhere
+    fig = make_subplots(rows=len(dimensions), cols=len(dimensions), horizontal_spacing=0.02, vertical_spacing=0.02)
+    columns = {dimension: final[dimension].to_numpy(dtype=float) for dimension in dimensions}
+
+    for row, y_dimension in enumerate(dimensions, start=1):
+        for col, x_dimension in enumerate(dimensions, start=1):
+            if (row == col):
+                values = columns[x_dimension][np.isfinite(columns[x_dimension])]
+                if (len(values) > 0):
+                    counts, edges = np.histogram(values, bins=eda_stats.nice_bin_edges(values, SCATTER_MATRIX_BINS))
+                    fig.add_trace(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, marker_color=px.colors.qualitative.Bold[0],
+                        hovertemplate=x_dimension + '=%{x}<br>count=%{y}<extra></extra>', showlegend=False), row=row, col=col)
+            else:
+                binned = eda_stats.histogram2d(columns[x_dimension], columns[y_dimension], SCATTER_MATRIX_BINS, SCATTER_MATRIX_BINS)
+                # empty bins are left transparent
+                z = np.where(binned['z'] > 0, np.log10(np.maximum(binned['z'], 1)), np.nan)
+                fig.add_trace(go.Heatmap(x=binned['x'], y=binned['y'], z=z, customdata=binned['z'], coloraxis='coloraxis',
+                    hovertemplate=x_dimension + '=%{x}<br>' + y_dimension + '=%{y}<br>count=%{customdata}<extra></extra>'), row=row, col=col)
+
+            if (row == len(dimensions)):
+                fig.update_xaxes(title_text=x_dimension, row=row, col=col)
+            else:
+                fig.update_xaxes(showticklabels=False, row=row, col=col)
+
+            if (col == 1):
+                fig.update_yaxes(title_text=y_dimension, row=row, col=col)
+            else:
+                fig.update_yaxes(showticklabels=False, row=row, col=col)
+
+    fig.update_layout(coloraxis_colorbar_title_text='log10(count)', height=400, bargap=0)
+
+    return fig
+
 @callback([Output("scatter-matrix-graph", "figure"),
+    Output("scatter-matrix-mode", "children"),
     Output("eda-bivariate-alert", "is_open")],
     [Input("checklist-scatter-matrix", "value"),
     Input("eda-bivariate-dropdown-county", "value"),
     Input("eda-bivariate-dropdown-city", "value"),
     Input("eda-bivariate-dropdown-vendor", "value")]
 )
+@figure_cache.cached_figures
 def update_scatter_matrix(checklist_values, dropdown_county, dropdown_city, dropdown_vendor):
 
     final = df 
@@ -189,9 +231,20 @@ def update_scatter_matrix(checklist_values, dropdown_county, dropdown_city, drop
     final = utils.filter_df_by_dropdown_select(final, dropdown_vendor, "vendor_name")
 
     if (len(final.index) == 0):
-        return dash.no_update, True
+        return dash.no_update, dash.no_update, True
+
+    rows = len(final.index)
+
+    if (rows > SCATTER_MATRIX_SAMPLE_ROWS and len(checklist_values) > 0):
+        return get_density_matrix(final, checklist_values), "Binned density of all {:,} rows".format(rows), False
 
-    return px.scatter_matrix(final, dimensions=checklist_values, color='liquor_type', color_discrete_sequence=px.colors.qualitative.Bold, height=400), False
+    if (rows > SCATTER_MATRIX_POINTS):
+        final = eda_stats.stratified_sample(final, "liquor_type", SCATTER_MATRIX_POINTS)
+        mode = "Sample of {:,} of {:,} rows, stratified by liquor type".format(len(final.index), rows)
+    else:
+        mode = "All {:,} rows".format(rows)
+
+    return px.scatter_matrix(final, dimensions=checklist_values, color='liquor_type', color_discrete_sequence=px.colors.qualitative.Bold, height=400), mode, False
 
 @callback(Output("eda-bivariate-heatmap", "figure"),
     [Input("radio-items-heatmap-x", "value"),
@@ -200,8 +253,15 @@ def update_scatter_matrix(checklist_values, dropdown_county, dropdown_city, drop
     Input("heatmap-bins-y", "value"),
     Input("heatmap-type-dropdown", "value")]
 )
+@figure_cache.cached_figures
 def update_heatmap(heatmap_x, bins_x, heatmap_y, bins_y, type_dropdown):
 
-    final = df[df['liquor_type'] == type_dropdown]
-    
-    return px.density_heatmap(final, x=heatmap_x, y=heatmap_y, nbinsx=int(round(bins_x)), nbinsy=int(round(bins_y)), height=400, template="pulse")
\ No newline at end of file
+    # binned on the server, only the count matrix is sent to the browser
+    binned = eda_stats.histogram2d(eda_stats.get_type_column(type_dropdown, heatmap_x), eda_stats.get_type_column(type_dropdown, heatmap_y),
+        int(round(bins_x)), int(round(bins_y)))
+
+    fig = go.Figure(go.Heatmap(x=binned['x'], y=binned['y'], z=binned['z'], coloraxis='coloraxis',
+        hovertemplate=heatmap_x + '=%{x}<br>' + heatmap_y + '=%{y}<br>count=%{z}<extra></extra>'))
+    fig.update_layout(xaxis_title=heatmap_x, yaxis_title=heatmap_y, coloraxis_colorbar_title_text='count', height=400, template="pulse")
+
+    return fig
\ No newline at end of file
@@ -1,13 +1,14 @@
-import os
 import dash
-import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.io as pio
+import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State, callback
 from dash_bootstrap_templates import load_figure_template
 
 import utils
-from helpers import layout_helpers, data_transformation
+from helpers import layout_helpers, dataset, figure_cache, eda_stats
 
 dash.register_page(
     __name__,
@@ -18,10 +19,7 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_eda(raw_df)
+df = dataset.get_eda_df()
 
 layout = html.Div([ 
     layout_helpers.eda_get_subheader("eda-days-of-week-info-btn"),
@@ -140,6 +138,43 @@ layout = html.Div([
     layout_helpers.get_positioned_alert("eda-days-row2-alert")
 ])
 
+def get_violin_figure(final, y_axis, days_order):
+    # violins drawn from densities estimated on the server - the browser gets one outline per weekday
+    # and a sample of the outliers instead of every invoice row
+    curves = eda_stats.kde_curves(final, y_axis, 'weekday', grid_size=256)
+    _, outliers = eda_stats.box_statistics(final, y_axis, 'weekday')
+    weekdays = [day for day in days_order if day in curves['groups']]
+    colour = pio.templates[pio.templates.default].layout.colorway[0]
+    hovertemplate = 'weekday=%{text}<br>' + y_axis + '=%{y}<extra></extra>'
+
+    fig = go.Figure()
+    for position, day in enumerate(weekdays):
+        density = curves['density'][curves['groups'].index(day)]
+        span = ~np.isnan(density)
+        grid = curves['grid'][span]
+
+        if (not span.any() or not density[span].max() > 0):
+            # no density to scale the outline by - a single marker at the weekday's values
+            fig.add_trace(go.Scatter(x=[position], y=[final.loc[final['weekday'] == day, y_axis].median()], mode='markers',
+                marker_color=colour, name=day, hovertemplate='weekday=' + day + '<br>' + y_axis + '=%{y}<extra></extra>', showlegend=False))
+            continue
+
+        # every violin is scaled to the same maximum width, like plotly's default scalemode
+        half_width = np.round(0.45 * density[span] / density[span].max(), 3)
+
+        fig.add_trace(go.Scatter(x=np.concatenate([position + half_width, position - half_width[::-1]]),
+            y=np.concatenate([grid, grid[::-1]]), mode='lines', fill='toself', line=dict(color=colour, width=1),
+            name=day, hovertemplate='weekday=' + day + '<br>' + y_axis + '=%{y}<extra></extra>', showlegend=False))
+
+    outliers = outliers[outliers['weekday'].isin(weekdays)]
+    fig.add_trace(go.Scatter(x=outliers['weekday'].map(weekdays.index), y=outliers[y_axis], text=outliers['weekday'],
+        mode='markers', marker_color=colour, hovertemplate=hovertemplate, showlegend=False))
+
+    fig.update_layout(xaxis_title='weekday', yaxis_title=y_axis, height=400)
+    fig.update_xaxes(tickvals=list(range(len(weekdays))), ticktext=weekdays)
+
+    return fig
+
 @callback(Output("eda-days-modal", "is_open"),
     Input("eda-days-of-week-info-btn", "n_clicks"),
     State("eda-days-modal", "is_open")
@@ -157,6 +192,7 @@ def toggle_modal(n_clicks, is_open):
     Input("eda-days-of-week-row1-dropdown-county", "value"),
     Input("eda-days-of-week-row1-dropdown-vendor", "value")]
 )
+@figure_cache.cached_figures
 def update_row1(radio_items_groupby_value, dropdown_type, dropdown_county, dropdown_vendor):
     
     final = df
@@ -167,13 +203,12 @@ def update_row1(radio_items_groupby_value, dropdown_type, dropdown_county, dropd
     if (len(final.index) == 0):
         return dash.no_update, dash.no_update, True
 
-    final_gb = final.groupby(['year_month', 'weekday'])[radio_items_groupby_value].sum().reset_index()
+    final_gb = final.groupby(['year_month', 'weekday'], observed=True)[radio_items_groupby_value].sum().reset_index()
 
     fig1 = px.bar(final_gb, x='year_month', y=radio_items_groupby_value, color='weekday', height=400, color_discrete_sequence=px.colors.qualitative.Bold)
 
     days_order = ['Sunday', 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-    fig2 = px.violin(final, x='weekday', y=radio_items_groupby_value, height=400)
-    fig2.update_xaxes(categoryorder='array', categoryarray=days_order)
+    fig2 = get_violin_figure(final, radio_items_groupby_value, days_order)
 
     return fig1, fig2, False
 
@@ -184,6 +219,7 @@ def update_row1(radio_items_groupby_value, dropdown_type, dropdown_county, dropd
     Input("eda-days-of-week-row2-dropdown-county", "value"),
     Input("eda-days-of-week-row2-dropdown-vendor", "value")]
 )
+@figure_cache.cached_figures
 def update_row2(radio_items_groupby_value, dropdown_month, dropdown_county, dropdown_vendor):
     
     final = df
@@ -194,7 +230,7 @@ def update_row2(radio_items_groupby_value, dropdown_month, dropdown_county, drop
     if (len(final.index) == 0):
         return dash.no_update, True
 
-    final_gb = final.groupby(['liquor_type', 'weekday'])[radio_items_groupby_value].sum().reset_index()
+    final_gb = final.groupby(['liquor_type', 'weekday'], observed=True)[radio_items_groupby_value].sum().reset_index()
     final_gb.sort_values([radio_items_groupby_value], ascending=False, inplace=True)
 
     fig = px.bar(final_gb, x='liquor_type', y=radio_items_groupby_value, color='weekday', facet_col='weekday', template="minty", height=400)
@@ -1,15 +1,10 @@
-import os
 import dash
-import pandas as pd
-from fbprophet import Prophet
 import dash_bootstrap_components as dbc
 from fbprophet.plot import plot_components_plotly
 from dash import dcc, html, Input, Output, State, callback
 from dash_bootstrap_templates import load_figure_template
-from fbprophet.diagnostics import cross_validation, performance_metrics
 
-import utils
-from helpers import layout_helpers, data_transformation
+from helpers import layout_helpers, forecasting, fast_forecasting, daily_series, background
 
 dash.register_page(
     __name__,
@@ -20,11 +15,6 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_forecasting(raw_df)
-
 forecast_text = {'bottles_sold': 'Bottles sold', 'volume_sold_liters': 'Volume sold (in litres)'}
 
 layout = html.Div([ 
@@ -40,6 +30,10 @@ layout = html.Div([
         ], width=2, className="ms-4 dbc"),
 
         dbc.Col([ 
+            # Prophet fit requested by the page and the last one the background job finished
+            dcc.Store(id="trends-fit-request"),
+            dcc.Store(id="trends-fitted"),
+            html.P(id="trends-progress", className="text-muted"),
             dcc.Loading(children=[dcc.Graph(id='prophet-output-components')], type='graph'),
         ], width=7, className="ms-5"),
 
@@ -110,21 +104,51 @@ def toggle_modal(n_clicks, is_open):
 )
 def update_alert_state(type_dropdown, vendor_dropdown):
 
-    final = df
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, type_dropdown, "liquor_type")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
-
-    if (len(final.index) == 0):
+    if (not daily_series.has_rows(type_dropdown, vendor_dropdown)):
         return True 
     else:
         return False
 
+def get_fit_request(var_to_forecast, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown):
+    # everything a Prophet fit and its cross-validation depend on - the horizon and the interval width are left
+    # out, changing them never starts a job
+    return {
+        'type_dropdown': sorted(type_dropdown or []),
+        'vendor_dropdown': sorted(vendor_dropdown or []),
+        'var_to_forecast': var_to_forecast,
+        'weekly_seasonality': bool(weekly_seasonality),
+        'monthly_seasonality': bool(monthly_seasonality),
+        'yearly_seasonality': bool(yearly_seasonality),
+        'holidays': bool(holidays)
+    }
+
+@callback(Output("trends-fitted", "data"),
+    Input("trends-fit-request", "data"),
+    # fit and cross-validation run as a background job, a newer request cancels the job it supersedes
+    background=True,
+    manager=background.background_callback_manager,
+    progress=Output("trends-progress", "children"),
+    progress_default="",
+    prevent_initial_call=True
+)
+def fit_prophet_model(set_progress, request):
+
+    training = daily_series.get_training_series(request['type_dropdown'], request['vendor_dropdown'], request['var_to_forecast'])
+
+    if (training is None):
+        return dash.no_update
+
+    forecasting.fit_and_validate(training['series'], request['weekly_seasonality'], request['monthly_seasonality'], request['yearly_seasonality'], request['holidays'], set_progress)
+
+    return request
+
 @callback([Output("kpi1-trends", "children"),
     Output("kpi2-trends", "children"),
     Output("kpi3-trends", "children"),
-    Output("prophet-output-components", "figure")],
-    [Input("radio-items-var-forecast", "value"),
+    Output("prophet-output-components", "figure"),
+    Output("trends-fit-request", "data")],
+    [Input("radio-items-forecast-engine", "value"),
+    Input("radio-items-var-forecast", "value"),
     Input("number-of-months-to-predict", "value"),
     Input("confidence-interval-slider", "value"),
     Input("weekly-seasonality-switch", "value"),
@@ -132,51 +156,52 @@ def update_alert_state(type_dropdown, vendor_dropdown):
     Input("yearly-seasonality-switch", "value"),
     Input("holidays-switch", "value"),
     Input("dropdown-type-name-forecasting", "value"),
-    Input("dropdown-vendor-name-forecasting", "value")]
+    Input("dropdown-vendor-name-forecasting", "value"),
+    Input("trends-fitted", "data")],
+    State("trends-fit-request", "data")
 )
-def update_dashboard(var_to_forecast, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown):
+def update_dashboard(engine, var_to_forecast, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown, fitted, fit_request):
 
-    final = df
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, type_dropdown, "liquor_type")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # daily series of the selected segments, summed from the precomputed per-segment series
+    training = daily_series.get_training_series(type_dropdown, vendor_dropdown, var_to_forecast)
 
-    if (len(final.index) == 0):
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    if (training is None):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-    final_df = final.groupby('Date')[var_to_forecast].sum().reset_index()
-    final_df.rename(columns={'Date': 'ds', var_to_forecast: 'y'}, inplace=True)
+    final_df = training['series']
 
-    confidence_interval = conf_interval / 100
-    model = Prophet(interval_width=confidence_interval, weekly_seasonality=weekly_seasonality, yearly_seasonality=yearly_seasonality, changepoint_prior_scale=0.1)
+    # the fast engine answers in the callback, Prophet is only predicted here from a model and metrics that are
+    # already stored (shared by the forecast pages and workers) - otherwise a background job is asked to fit it
+    result = forecasting.get_forecast(final_df, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, engine, fit=False)
 
-    if (monthly_seasonality):
-        model.add_seasonality(name='monthly', period=30.5, fourier_order=1)
+    if (result is None):
+        request = get_fit_request(var_to_forecast, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown)
 
-    if (holidays):
-        model.add_country_holidays(country_name='US')
+        if (dash.ctx.triggered_id != "trends-fitted" or fitted != request):
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, (dash.no_update if request == fit_request else request)
 
-    model.fit(final_df)
+        # the job finished but its model did not make it to the disk store (e.g. a read-only cache) - fit here
+        result = forecasting.get_forecast(final_df, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, engine)
 
-    periods_to_predict = int(round(num_months_to_predict * 30.5))
-    future = model.make_future_dataframe(periods=periods_to_predict, freq='D')
-    forecast = model.predict(future)
+    model = result['model']
+    forecast = result['forecast']
 
-    df_cv = cross_validation(model, initial='330 days', period='15 days', horizon = '30 days')
-    df_p = performance_metrics(df_cv)
+    max_rmse = training['max']
+    min_rmse = training['min']
 
-    max_rmse = max(final[var_to_forecast].tolist())
-    min_rmse = min(final[var_to_forecast].tolist())
-
-    mape = round(df_p['mape'].tolist()[-1], 2)
-    rmse = round(df_p['rmse'].tolist()[-1], 2)
+    mape = round(result['mape'], 2)
+    rmse = round(result['rmse'], 2)
     norm_rmse = round(rmse / (max_rmse - min_rmse), 2)
 
-    fig = plot_components_plotly(model, forecast)
+    if (engine == 'fast'):
+        fig = fast_forecasting.plot_components(model, forecast)
+    else:
+        fig = plot_components_plotly(model, forecast)
+
     fig.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'},
         title=forecast_text[var_to_forecast] + " - Trends",
         height=750, width=1100,
         template="pulse"
     )
 
-    return str(mape) + '%', rmse, norm_rmse, fig
\ No newline at end of file
+    return str(mape) + '%', rmse, norm_rmse, fig, dash.no_update
\ No newline at end of file
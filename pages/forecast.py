@@ -1,16 +1,12 @@
-import os
 import dash
 import pandas as pd
-from fbprophet import Prophet
 import plotly.graph_objects as go
 from fbprophet.plot import plot_plotly
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State, callback
 from dash_bootstrap_templates import load_figure_template
-from fbprophet.diagnostics import cross_validation, performance_metrics
 
-import utils
-from helpers import layout_helpers, data_transformation
+from helpers import layout_helpers, forecasting, fast_forecasting, daily_series, background
 
 dash.register_page(
     __name__,
@@ -21,11 +17,6 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_forecasting(raw_df)
-
 forecast_text = {'bottles_sold': 'Bottles sold', 'volume_sold_liters': 'Volume sold (in litres)'}
 
 layout = html.Div([ 
@@ -41,6 +32,10 @@ layout = html.Div([
         ], width=2, className="ms-4 dbc"),
 
         dbc.Col([ 
+            # Prophet fit requested by the page and the last one the background job finished
+            dcc.Store(id="forecast-fit-request"),
+            dcc.Store(id="forecast-fitted"),
+            html.P(id="forecast-progress", className="text-muted"),
             dbc.Spinner(children=[dcc.Graph(id='prophet-output-graph')], color='primary'),
             dbc.Spinner(children=[dcc.Graph(id='go-figure-predicted-graph')], color='primary')
         ], width=7, className="ms-5"),
@@ -112,23 +107,53 @@ def toggle_modal(n_clicks, is_open):
 )
 def update_alert_state(type_dropdown, vendor_dropdown):
 
-    final = df
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, type_dropdown, "liquor_type")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
-
-    if (len(final.index) == 0):
+    if (not daily_series.has_rows(type_dropdown, vendor_dropdown)):
         return True 
 
     else:
         return False
 
+def get_fit_request(var_to_forecast, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown):
+    # everything a Prophet fit and its cross-validation depend on - the horizon and the interval width are left
+    # out, changing them never starts a job
+    return {
+        'type_dropdown': sorted(type_dropdown or []),
+        'vendor_dropdown': sorted(vendor_dropdown or []),
+        'var_to_forecast': var_to_forecast,
+        'weekly_seasonality': bool(weekly_seasonality),
+        'monthly_seasonality': bool(monthly_seasonality),
+        'yearly_seasonality': bool(yearly_seasonality),
+        'holidays': bool(holidays)
+    }
+
+@callback(Output("forecast-fitted", "data"),
+    Input("forecast-fit-request", "data"),
+    # fit and cross-validation run as a background job, a newer request cancels the job it supersedes
+    background=True,
+    manager=background.background_callback_manager,
+    progress=Output("forecast-progress", "children"),
+    progress_default="",
+    prevent_initial_call=True
+)
+def fit_prophet_model(set_progress, request):
+
+    training = daily_series.get_training_series(request['type_dropdown'], request['vendor_dropdown'], request['var_to_forecast'])
+
+    if (training is None):
+        return dash.no_update
+
+    forecasting.fit_and_validate(training['series'], request['weekly_seasonality'], request['monthly_seasonality'], request['yearly_seasonality'], request['holidays'], set_progress)
+
+    return request
+
 @callback([Output("kpi1-forecast", "children"),
     Output("kpi2-forecast", "children"),
     Output("kpi3-forecast", "children"),
     Output("prophet-output-graph", "figure"),
-    Output("go-figure-predicted-graph", "figure")],
-    [Input("radio-items-var-forecast", "value"),
+    Output("go-figure-predicted-graph", "figure"),
+    Output("forecast-fit-request", "data")],
+    [Input("radio-items-forecast-engine", "value"),
+    Input("radio-items-var-forecast", "value"),
     Input("number-of-months-to-predict", "value"),
     Input("confidence-interval-slider", "value"),
     Input("weekly-seasonality-switch", "value"),
@@ -136,48 +161,48 @@ def update_alert_state(type_dropdown, vendor_dropdown):
     Input("yearly-seasonality-switch", "value"),
     Input("holidays-switch", "value"),
     Input("dropdown-type-name-forecasting", "value"),
-    Input("dropdown-vendor-name-forecasting", "value")]
+    Input("dropdown-vendor-name-forecasting", "value"),
+    Input("forecast-fitted", "data")],
+    State("forecast-fit-request", "data")
 )
-def update_dashboard(var_to_forecast, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown):
-
-    final = df
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, type_dropdown, "liquor_type")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
-
-    if (len(final.index) == 0):
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+def update_dashboard(engine, var_to_forecast, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown, fitted, fit_request):
 
-    final_df = final.groupby('Date')[var_to_forecast].sum().reset_index()
-    final_df.rename(columns={'Date': 'ds', var_to_forecast: 'y'}, inplace=True)
+    # daily series of the selected segments, summed from the precomputed per-segment series
+    training = daily_series.get_training_series(type_dropdown, vendor_dropdown, var_to_forecast)
 
-    confidence_interval = conf_interval / 100
-    model = Prophet(interval_width=confidence_interval, weekly_seasonality=weekly_seasonality, yearly_seasonality=yearly_seasonality, changepoint_prior_scale=0.1)
+    if (training is None):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
 
-    if (monthly_seasonality):
-        model.add_seasonality(name='monthly', period=30.5, fourier_order=1)
+    final_df = training['series']
 
-    if (holidays):
-        model.add_country_holidays(country_name='US')
+    # the fast engine answers in the callback, Prophet is only predicted here from a model and metrics that are
+    # already stored (shared by the forecast pages and workers) - otherwise a background job is asked to fit it
+    result = forecasting.get_forecast(final_df, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, engine, fit=False)
 
-    model.fit(final_df)
+    if (result is None):
+        request = get_fit_request(var_to_forecast, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, type_dropdown, vendor_dropdown)
 
-    periods_to_predict = int(round(num_months_to_predict * 30.5))
-    future = model.make_future_dataframe(periods=periods_to_predict, freq='D')
+        if (dash.ctx.triggered_id != "forecast-fitted" or fitted != request):
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, (dash.no_update if request == fit_request else request)
 
-    forecast = model.predict(future)
+        # the job finished but its model did not make it to the disk store (e.g. a read-only cache) - fit here
+        result = forecasting.get_forecast(final_df, num_months_to_predict, conf_interval, weekly_seasonality, monthly_seasonality, yearly_seasonality, holidays, engine)
 
-    df_cv = cross_validation(model, initial='330 days', period='15 days', horizon = '30 days')
-    df_p = performance_metrics(df_cv)
+    model = result['model']
+    forecast = result['forecast']
 
-    max_rmse = max(final[var_to_forecast].tolist())
-    min_rmse = min(final[var_to_forecast].tolist())
+    max_rmse = training['max']
+    min_rmse = training['min']
 
-    mape = round(df_p['mape'].tolist()[-1], 2)
-    rmse = round(df_p['rmse'].tolist()[-1], 2)
+    mape = round(result['mape'], 2)
+    rmse = round(result['rmse'], 2)
     norm_rmse = round(rmse / (max_rmse - min_rmse), 2)
 
-    fig1 = plot_plotly(model, forecast)
+    if (engine == 'fast'):
+        fig1 = fast_forecasting.plot_forecast(model, forecast)
+    else:
+        fig1 = plot_plotly(model, forecast)
+
     fig1.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'},
                     xaxis_title='Date', yaxis_title=forecast_text[var_to_forecast], 
                     height=400, width=1100, 
@@ -185,8 +210,11 @@ def update_dashboard(var_to_forecast, num_months_to_predict, conf_interval, week
                     template="pulse"
     )
 
-    future_fig2 = model.make_future_dataframe(periods=num_months_to_predict, freq='M')
-    forecast_fig2 = model.predict(future_fig2)
+    if (engine == 'fast'):
+        future_fig2 = fast_forecasting.make_future_dataframe(model, num_months_to_predict, freq='M')
+        forecast_fig2 = fast_forecasting.predict(model, future_fig2, conf_interval / 100)
+    else:
+        forecast_fig2 = forecasting.predict(result['key'], model, conf_interval / 100, num_months_to_predict, freq='M')
     
     to_plot = pd.merge(final_df, forecast_fig2, on='ds', how='outer')
     to_plot['type'] = 'Observed'
@@ -220,5 +248,5 @@ def update_dashboard(var_to_forecast, num_months_to_predict, conf_interval, week
                     title=forecast_text[var_to_forecast] + " - Monthly Forecast",
                     template="pulse")
 
-    return str(mape) + '%', rmse, norm_rmse, fig1, fig2
+    return str(mape) + '%', rmse, norm_rmse, fig1, fig2, dash.no_update
 
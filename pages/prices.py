@@ -1,13 +1,11 @@
-import os
 import dash
-import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output, State, callback
 from dash_bootstrap_templates import load_figure_template
 
 import utils
-from helpers import layout_helpers
+from helpers import layout_helpers, dataset, figure_cache, eda_stats
 
 dash.register_page(
     __name__,
@@ -18,9 +16,7 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
+df = dataset.get_eda_df()
 
 types = utils.get_unique_values(df, "liquor_type")
 types_radio_items = list()
@@ -125,6 +121,26 @@ layout = html.Div([
     layout_helpers.get_positioned_alert("eda-prices-alert")
 ])
 
+def get_box_figure(final, x_axis, group_column):
+    # box plot of x_axis per group from precomputed statistics - the browser gets five numbers and a
+    # sample of outliers per group instead of every invoice row
+    stats, outliers = eda_stats.box_statistics(final, x_axis, group_column)
+
+    # the outliers take the colour of the box, the first one of the figure's template
+    fig = go.Figure(layout=dict(template="pulse"))
+    colour = fig.layout.template.layout.colorway[0]
+
+    fig.add_traces([
+        go.Box(y=stats[group_column], q1=stats['q1'], median=stats['median'], q3=stats['q3'],
+            lowerfence=stats['lowerfence'], upperfence=stats['upperfence'], orientation='h',
+            marker_color=colour, name=x_axis, showlegend=False),
+        go.Scatter(x=outliers[x_axis], y=outliers[group_column], mode='markers', marker_color=colour,
+            name=x_axis, showlegend=False)
+    ])
+    fig.update_layout(xaxis_title=x_axis, yaxis_title=group_column, height=400)
+
+    return fig
+
 @callback(Output("eda-prices-modal", "is_open"),
     Input("eda-prices-info-btn", "n_clicks"),
     State("eda-prices-modal", "is_open")
@@ -143,6 +159,7 @@ def toggle_modal(n_clicks, is_open):
     Input("prices-city-dropdown", "value"),
     Input("prices-rangeslider-pack", "value")]
 )
+@figure_cache.cached_figures
 def update_dashboard(type_selection, x_axis, county_dropdown, city_dropdown, pack_slider_value):
 
     final = df[(df["pack"] >= pack_slider_value[0]) & (df["pack"] <= pack_slider_value[1])]
@@ -153,7 +170,7 @@ def update_dashboard(type_selection, x_axis, county_dropdown, city_dropdown, pac
     if (len(final.index) == 0):
         return dash.no_update, dash.no_update, True
 
-    fig1 = px.box(final, x=x_axis, y="vendor_name", height=400, template="pulse")
-    fig2 = px.box(final, x=x_axis, y="category_name", height=400, template="pulse")
+    fig1 = get_box_figure(final, x_axis, "vendor_name")
+    fig2 = get_box_figure(final, x_axis, "category_name")
 
     return fig1, fig2, False
\ No newline at end of file
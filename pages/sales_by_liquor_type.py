@@ -1,4 +1,3 @@
-import os
 import dash
 import pandas as pd
 import plotly.express as px
@@ -7,7 +6,7 @@ from dash_bootstrap_templates import load_figure_template
 from dash import dcc, html, Input, Output, State, callback
 
 import utils
-from helpers import layout_helpers, data_transformation
+from helpers import layout_helpers, filters, figure_cache
 
 dash.register_page(
     __name__,
@@ -18,11 +17,6 @@ dash.register_page(
 
 load_figure_template("pulse")
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_by_store(raw_df)
-
 # title for bar chart
 x_axis_dict = {'Date': 'date', 'week_start_date': 'week', 'year_month': 'month'}
 y_axis_dict = {'bottles_sold': 'Bottles sold', 'sale_dollars': 'Sales (in dollars)', 'volume_sold_liters': 'Volume sold (in litres)'}
@@ -140,29 +134,25 @@ def toggle_settings_menu(n, is_open):
     Input("dropdown-category-name", "value"),
     Input("dropdown-vendor-name", "value")]
 )
+@figure_cache.cached_figures
 def update_row1(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown):
 
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final) == 0):
         return dash.no_update, dash.no_update, True
 
-    tree1 = final.groupby(['liquor_type', 'category_name'])['bottles_sold'].sum().reset_index(name='bottles_sold')
-    tree2 = final.groupby(['liquor_type', 'category_name'])['sale_dollars'].sum().round(2).reset_index(name='sale_dollars')
-    treemap_df = pd.merge(tree1, tree2, on=['liquor_type', 'category_name'])
+    tree1 = final.groupby(['liquor_type', 'category_name'], observed=True)['bottles_sold'].sum().reset_index(name='bottles_sold')
+    tree2 = final.groupby(['liquor_type', 'category_name'], observed=True)['sale_dollars'].sum().round(2).reset_index(name='sale_dollars')
+    treemap_df = utils.categorical_to_object(pd.merge(tree1, tree2, on=['liquor_type', 'category_name']))
 
     # color_continuous_scale="Aggrnyl"
     treemap = px.treemap(treemap_df, path=[px.Constant("Liquor type"), "liquor_type", "category_name"], 
         values="bottles_sold", color="sale_dollars", template="pulse", title="Liquor type -> Category names")
 
-    sunburst_df = final.groupby(['liquor_type', 'vendor_name'])['bottles_sold'].sum().reset_index(name='bottles_sold')
+    sunburst_df = final.groupby(['liquor_type', 'vendor_name'], observed=True)['bottles_sold'].sum().reset_index(name='bottles_sold')
+    sunburst_df = utils.categorical_to_object(sunburst_df)
     sunburst = px.sunburst(sunburst_df, path=['liquor_type', 'vendor_name'], values='bottles_sold', template="minty", title="Liquor type -> Vendor names")
 
     return treemap, sunburst, False
@@ -177,21 +167,16 @@ def update_row1(start_date, end_date, county_dropdown, city_dropdown, category_d
     Input("radio-items-x-axis", "value"),
     Input("radio-items-y-axis", "value")]
 )
+@figure_cache.cached_figures
 def update_row2(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown, radio_items_x, radio_items_y):
 
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final.index) == 0):
         return dash.no_update
 
-    area_df = final.groupby(['liquor_type', radio_items_x])[radio_items_y].sum().round(2).reset_index(name=radio_items_y)
+    area_df = final.groupby(['liquor_type', radio_items_x], observed=True)[radio_items_y].sum().round(2).reset_index(name=radio_items_y)
     area = px.area(area_df, x=radio_items_x, y=radio_items_y, color='liquor_type', height=350, color_discrete_sequence=px.colors.qualitative.Bold, 
         title=y_axis_dict[radio_items_y] + " by " + x_axis_dict[radio_items_x])
     area.update_layout({'plot_bgcolor': 'rgba(0, 0, 0, 0)', 'paper_bgcolor': 'rgba(0, 0, 0, 0)'},
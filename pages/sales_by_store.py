@@ -1,13 +1,11 @@
 import os
 import dash
-import pandas as pd
 import plotly.express as px
 import dash_bootstrap_components as dbc
 from dash_bootstrap_templates import load_figure_template
 from dash import dcc, html, Input, Output, State, callback
 
-import utils
-from helpers import layout_helpers, data_transformation
+from helpers import layout_helpers, filters, figure_cache
 
 dash.register_page(
     __name__,
@@ -22,9 +20,6 @@ DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
 # set token to use Mapbox API
 px.set_mapbox_access_token(open(os.path.join(DATAPATH, ".mapbox_token")).read())
 
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_by_store(raw_df)
-
 # title for bar chart
 y_axis_dict = {'bottles_sold': 'Bottles sold', 'sale_dollars': 'Sales (in dollars)', 'volume_sold_liters': 'Volume sold (in litres)'}
 
@@ -208,19 +203,13 @@ def update_colour_picker(dark_switch):
     Input("radio-items-bubble-value", "value")]
 )
 def update_range_slider(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown, radio_bubble_value):
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final.index) == 0):
         return dash.no_update, dash.no_update, dash.no_update
 
-    transformed = final.groupby(['store_name', 'address', 'city', 'lat', 'lon'])[radio_bubble_value].sum().reset_index(name='value')
+    transformed = final.groupby(['store_name', 'address', 'city', 'lat', 'lon'], observed=True)[radio_bubble_value].sum().reset_index(name='value')
 
     range_min = min(transformed['value'])
     range_max = max(transformed['value'])
@@ -242,21 +231,16 @@ def update_range_slider(start_date, end_date, county_dropdown, city_dropdown, ca
     Input("scatter-map-marker-colour", "value"),
     Input("range-slider-scatter-values", "value")]
 )
+@figure_cache.cached_figures
 def update_scatter_mapbox(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown, radio_bubble_value, light_switch_value, marker_colour, range_value):
 
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final.index) == 0):
         return dash.no_update, True
 
-    transformed = final.groupby(['store_name', 'address', 'city', 'county', 'lat', 'lon'])[radio_bubble_value].sum().reset_index(name='value')
+    transformed = final.groupby(['store_name', 'address', 'city', 'county', 'lat', 'lon'], observed=True)[radio_bubble_value].sum().reset_index(name='value')
 
     # filter by ranger slider selection
     transformed = transformed[(transformed['value'] >= range_value[0]) & (transformed['value'] <= range_value[1])]
@@ -288,21 +272,16 @@ def update_scatter_mapbox(start_date, end_date, county_dropdown, city_dropdown,
     Input("radio-items-bar-value", "value"),
     Input("radio-items-x-city-county", "value")]
 )
+@figure_cache.cached_figures
 def update_bar_chart(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown, radio_bar_value, radio_items_bar_chart_x):
 
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final.index) == 0):
         return dash.no_update
 
-    bar_chart_df = final.groupby([radio_items_bar_chart_x])[radio_bar_value].sum().round(2).reset_index(name='value')
+    bar_chart_df = final.groupby([radio_items_bar_chart_x], observed=True)[radio_bar_value].sum().round(2).reset_index(name='value')
     bar_chart_df.sort_values(by=['value'], ascending=False, inplace=True)
 
     fig = px.bar(bar_chart_df, x=radio_items_bar_chart_x, y='value', height=350, template="minty", title=y_axis_dict[radio_bar_value] + " by " + radio_items_bar_chart_x)
@@ -1,4 +1,3 @@
-import os
 import dash
 import pandas as pd
 import dash_bio as dashbio
@@ -6,7 +5,7 @@ import dash_bootstrap_components as dbc
 from dash import html, dash_table, Input, Output, State, callback
 
 import utils
-from helpers import layout_helpers, circos_helpers, data_transformation
+from helpers import layout_helpers, circos_helpers, filters
 
 dash.register_page(
     __name__,
@@ -15,11 +14,6 @@ dash.register_page(
     name="Sales Overview"
 )
 
-DATAPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "../data")
-
-raw_df = pd.read_csv(os.path.join(DATAPATH,"Iowa_liquor_sales_2021_minimal_with_type.csv"), index_col=False)
-df = data_transformation.transform_sales_data_overview(raw_df)
-
 layout_config = {
     "labels": {"display": False},
     "ticks": {"display": False},
@@ -220,21 +214,15 @@ def toggle_settings_menu(n, is_open):
 )
 def update_dashboard(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown):
 
-    # filter df by start and end dates selected
-    final = df[(df['Date'] >= start_date) & (df['Date'] <= end_date)]
-
-    # filter df by dropdown selections
-    final = utils.filter_df_by_dropdown_select(final, county_dropdown, "county")
-    final = utils.filter_df_by_dropdown_select(final, city_dropdown, "city")
-    final = utils.filter_df_by_dropdown_select(final, category_dropdown, "category_name")
-    final = utils.filter_df_by_dropdown_select(final, vendor_dropdown, "vendor_name")
+    # filter df by start and end dates and dropdown selections
+    final = filters.filter_insights_df(start_date, end_date, county_dropdown, city_dropdown, category_dropdown, vendor_dropdown)
 
     if (len(final.index) == 0):
         return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, True
 
-    # write json file and read it into a variable which will be used for Calendar Circos
-    circos_helpers.write_circos_json(final)
-    circos_data = circos_helpers.read_json(os.path.join(DATAPATH,"circos_data.json"))   
+    # daily metrics shared by the Calendar Circos rings and the KPIs
+    daily = circos_helpers.aggregate_daily_metrics(final)
+    circos_data = circos_helpers.build_circos_data(daily)
 
     # calendar circos returns
     layout = circos_data["calendar"]
@@ -267,16 +255,16 @@ def update_dashboard(start_date, end_date, county_dropdown, city_dropdown, categ
             ]
 
     # KPI returns
-    kpi1 = utils.format_large_numbers(final.shape[0]) 
-    kpi2 = utils.format_large_numbers(final['sale_dollars'].sum().round(2)) 
-    kpi3 = utils.format_large_numbers(final['bottles_sold'].sum()) 
+    kpi1 = utils.format_large_numbers(daily['orders'].sum()) 
+    kpi2 = utils.format_large_numbers(daily['sale_dollars'].sum().round(2)) 
+    kpi3 = utils.format_large_numbers(daily['bottles_sold'].sum()) 
 
     # transform df for data table
-    transformed1 = final.groupby(['category_name'])['sale_dollars'].sum().round(2).reset_index(name='value')
+    transformed1 = final.groupby(['category_name'], observed=True)['sale_dollars'].sum().round(2).reset_index(name='value')
     transformed1.sort_values('value', ascending=False, inplace=True, ignore_index=True)
     transformed1.rename(columns={'value': 'Sale ($)'}, inplace=True)
 
-    transformed2 = final.groupby(['category_name'])['bottles_sold'].sum().round(2).reset_index(name='value')
+    transformed2 = final.groupby(['category_name'], observed=True)['bottles_sold'].sum().round(2).reset_index(name='value')
     transformed2.sort_values('value', ascending=False, inplace=True, ignore_index=True)
     transformed2.rename(columns={'value': "Bottles sold"}, inplace=True)
 
@@ -0,0 +1,63 @@
+import time
+import threading
+import diskcache
+import psutil
+
+from helpers.background import SharedJobsManager
+
+def make_manager(path) -> SharedJobsManager:
+    return SharedJobsManager(diskcache.Cache(str(path)), cache_by=[lambda: 'version'], expire=60)
+
+def slow_job(cache_path: str):
+    def job_fn(result_key, progress_key, user_callback_args, context):
+        time.sleep(1.5)
+        diskcache.Cache(cache_path).set(result_key, 'result')
+
+    return job_fn
+
+def test_identical_jobs_in_flight_share_one_process(tmp_path):
+    manager = make_manager(tmp_path)
+    job_fn = slow_job(str(tmp_path))
+    barrier = threading.Barrier(4)
+    jobs = []
+
+    def request():
+        barrier.wait()
+        jobs.append(manager.call_job_fn('key', job_fn, [], {}))
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(jobs)) == 1
+    assert manager.job_running(jobs[0])
+
+    # three of the four requests are cancelled, the fourth still gets its result
+    for _ in range(3):
+        manager.terminate_job(jobs[0])
+    assert manager.job_running(jobs[0])
+
+    deadline = time.time() + 10
+    while (not manager.result_ready('key') and time.time() < deadline):
+        time.sleep(0.1)
+    assert manager.get_result('key', jobs[0]) == 'result'
+
+def test_job_is_stopped_when_every_request_cancels(tmp_path):
+    manager = make_manager(tmp_path)
+    job_fn = slow_job(str(tmp_path))
+
+    first = manager.call_job_fn('key', job_fn, [], {})
+    second = manager.call_job_fn('key', job_fn, [], {})
+    assert first == second
+
+    manager.terminate_job(first)
+    assert manager.job_running(first)
+    manager.terminate_job(second)
+    assert not psutil.pid_exists(first) or not manager.job_running(first)
+
+    # a new request after the cancellation starts a new job
+    third = manager.call_job_fn('key', job_fn, [], {})
+    assert third != first
+    manager.terminate_job(third)
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+
+from helpers import daily_series
+
+def invoice_rows(start: str, days: int, vendors: list(), seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    rows = 300
+
+    return pd.DataFrame({
+        'Date': pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit='D'),
+        'liquor_type': pd.Categorical(rng.choice(['Rum', 'Gin', None], rows)),
+        'vendor_name': rng.choice(vendors, rows).astype(object),
+        'bottles_sold': rng.integers(1, 24, rows),
+        'volume_sold_liters': rng.uniform(0.5, 20, rows)
+    })
+
+def long_form(store: dict()) -> pd.DataFrame:
+    # one row per date and segment with invoice rows, comparable whatever the order of dates and segments
+    dates, segments = np.nonzero(store['rows'])
+    df = store['segments'].iloc[segments].fillna('<missing>').reset_index(drop=True)
+    df['Date'] = store['dates'][dates]
+    df['rows'] = store['rows'][dates, segments]
+    for metric in daily_series.SERIES_METRICS:
+        df[metric] = store['values'][metric][dates, segments]
+        df[metric + '_min'] = store['min'][metric][segments]
+        df[metric + '_max'] = store['max'][metric][segments]
+
+    return df.sort_values(['Date'] + daily_series.SEGMENT_COLUMNS).reset_index(drop=True)
+
+def test_merge_daily_series_with_overlapping_dates_and_new_segments():
+    first = invoice_rows('2021-01-01', 20, ['Diageo', 'Sazerac'], 0)
+    # overlaps the last ten days of the first rows and brings a vendor of its own
+    second = invoice_rows('2021-01-11', 20, ['Diageo', 'Luxco', None], 1)
+
+    merged = daily_series.merge_daily_series(daily_series.build_daily_series(first), daily_series.build_daily_series(second))
+    expected = daily_series.build_daily_series(pd.concat([first, second], ignore_index=True))
+
+    pd.testing.assert_frame_equal(long_form(merged), long_form(expected))
+    assert merged['dates'].is_monotonic_increasing
+    assert len(merged['segments'].index) == len(expected['segments'].index)
+
+def test_append_rows_folds_chunks_into_the_store():
+    chunks = [invoice_rows('2021-01-01', 15, ['Diageo'], 2), invoice_rows('2021-01-10', 15, ['Diageo', 'Luxco'], 3),
+        invoice_rows('2021-02-01', 5, [None], 4)]
+
+    store = None
+    for chunk in chunks:
+        store = daily_series.append_rows(store, chunk)
+
+    expected = daily_series.build_daily_series(pd.concat(chunks, ignore_index=True))
+    pd.testing.assert_frame_equal(long_form(store), long_form(expected))
+
+def test_written_daily_series_reads_back(tmp_path):
+    store = daily_series.build_daily_series(invoice_rows('2021-01-01', 30, ['Diageo', None], 5))
+    path = str(tmp_path / 'daily_series.npz')
+
+    daily_series.write_daily_series(store, path)
+
+    pd.testing.assert_frame_equal(long_form(daily_series.read_daily_series(path)), long_form(store))
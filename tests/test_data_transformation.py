@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from helpers import data_transformation
+
+def _sales_frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    rows = 400
+
+    df = pd.DataFrame({'Date': np.sort(pd.Timestamp('2021-03-01') + pd.to_timedelta(rng.integers(0, 10, rows), unit='D'))})
+    df['store_name'] = pd.Categorical(rng.choice(['Hy-Vee', 'Fareway', None], rows))
+    df['address'] = df['store_name'].astype(object).map({'Hy-Vee': '1 Main St', 'Fareway': '2 Oak Ave'})
+    df['store_location'] = rng.choice(['POINT (-93.6 41.6)', None], rows).astype(object)
+    df['city'] = 'Ames'
+    df['county'] = 'Story'
+    df['category_name'] = pd.Categorical(rng.choice(['Vodka', 'Rum'], rows))
+    df['liquor_type'] = df['category_name'].astype(str)
+    df['vendor_name'] = rng.choice(['Diageo', 'Sazerac', None], rows).astype(object)
+    df['week_start_date'] = df['Date'] - pd.to_timedelta(df['Date'].dt.weekday, unit='D')
+    df['year_month'] = df['Date'].dt.strftime('%Y-%m')
+    df['lat'] = 41.6
+    df['lon'] = -93.6
+    df['sale_dollars'] = rng.uniform(5, 100, rows).round(2)
+    df['bottles_sold'] = rng.integers(1, 12, rows)
+    df['volume_sold_liters'] = np.where(rng.random(rows) < 0.1, np.nan, rng.uniform(0.5, 9, rows))
+
+    return df
+
+def test_build_sales_cube_matches_a_groupby_keeping_missing_keys():
+    df = _sales_frame()
+
+    cube = data_transformation.build_sales_cube(df)
+
+    dimensions = data_transformation.CUBE_DIMENSIONS
+    expected = df.astype({column: object for column in dimensions[1:]}).groupby(dimensions, dropna=False, sort=True).agg(
+        sale_dollars=('sale_dollars', 'sum'),
+        bottles_sold=('bottles_sold', 'sum'),
+        volume_sold_liters=('volume_sold_liters', 'sum'),
+        orders=('Date', 'size')
+    ).reset_index()
+
+    actual = cube.astype({column: object for column in dimensions[1:]}).set_index(dimensions).sort_index()
+    expected = expected.set_index(dimensions).sort_index()
+
+    assert cube['Date'].is_monotonic_increasing
+    assert cube['store_name'].isna().any() and cube['vendor_name'].isna().any()
+    assert cube['orders'].sum() == len(df.index)
+    assert actual.index.equals(expected.index)
+    np.testing.assert_allclose(actual['sale_dollars'], expected['sale_dollars'])
+    np.testing.assert_array_equal(actual['bottles_sold'], expected['bottles_sold'])
+    np.testing.assert_allclose(actual['volume_sold_liters'], expected['volume_sold_liters'])
+    np.testing.assert_array_equal(actual['orders'], expected['orders'])
+
+def test_build_sales_cube_keeps_the_attributes_of_each_cell():
+    df = _sales_frame()
+
+    cube = data_transformation.build_sales_cube(df)
+
+    assert list(cube.columns) == data_transformation.CUBE_DIMENSIONS + data_transformation.CUBE_ATTRIBUTES + data_transformation.CUBE_MEASURES + ['orders']
+    assert (cube['week_start_date'] <= cube['Date']).all()
+    assert (cube['year_month'] == cube['Date'].dt.strftime('%Y-%m')).all()
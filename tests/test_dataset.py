@@ -0,0 +1,59 @@
+import os
+import json
+import pytest
+import numpy as np
+import pandas as pd
+
+from helpers import dataset
+
+def test_cache_is_valid_when_the_metadata_cannot_be_rewritten(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+
+    source = tmp_path / 'sales.csv'
+    source.write_text('Date\n2021-01-01\n')
+    (tmp_path / 'sales.feather').write_bytes(b'')
+    (tmp_path / 'sales_cube' / 'v1').mkdir(parents=True)
+    (tmp_path / 'sales_cube' / 'CURRENT').write_text('v1')
+
+    meta = dataset._source_fingerprint(str(source))
+    meta['sha256'] = dataset._file_sha256(str(source))
+    meta['mtime_ns'] -= 1
+    (tmp_path / 'sales.json').write_text(json.dumps(meta))
+
+    monkeypatch.setattr(dataset, 'SALES_CSV', str(source))
+    monkeypatch.setattr(dataset, 'SALES_CACHE', str(tmp_path / 'sales.feather'))
+    monkeypatch.setattr(dataset, 'SALES_CUBE_PARTITIONS', str(tmp_path / 'sales_cube'))
+    monkeypatch.setattr(dataset, 'SALES_CACHE_META', str(tmp_path / 'sales.json'))
+
+    def read_only(path, data):
+        raise PermissionError(path)
+
+    monkeypatch.setattr(dataset, '_write_json_atomic', read_only)
+
+    assert dataset.cache_is_valid()
+
+def _cube(dates: list()) -> pd.DataFrame:
+    return pd.DataFrame({'Date': pd.to_datetime(dates), 'sale_dollars': np.arange(len(dates), dtype=float)})
+
+def test_rebuilt_cube_is_swapped_in_as_a_new_version(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+
+    root = str(tmp_path / 'sales_cube')
+    monkeypatch.setattr(dataset, 'SALES_CUBE_PARTITIONS', root)
+    monkeypatch.setattr(dataset, '_cube_months', dict())
+    monkeypatch.setattr(dataset, 'cache_is_valid', lambda: True)
+
+    dataset._write_month_partitions_atomic(_cube(['2021-01-05', '2021-02-10']), root)
+    first = dataset.get_cube_version()
+    assert dataset.get_cube_months(first) == [(2021, 1), (2021, 2)]
+
+    dataset._write_month_partitions_atomic(_cube(['2021-01-05', '2021-02-10', '2021-03-15']), root)
+    second = dataset.get_cube_version()
+    assert second != first
+    assert dataset.get_cube_months(second) == [(2021, 1), (2021, 2), (2021, 3)]
+    assert len(dataset.read_cube_partition(second, (2021, 3)).index) == 1
+
+    # readers still on the previous version can finish, the one before is removed
+    assert len(dataset.read_cube_partition(first, (2021, 2)).index) == 1
+    dataset._write_month_partitions_atomic(_cube(['2021-01-05']), root)
+    assert sorted(os.listdir(root)) == sorted(['CURRENT', second, dataset.get_cube_version()])
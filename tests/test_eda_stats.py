@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+
+from helpers import eda_stats
+
+def test_kde_curves_single_row_and_constant_groups():
+    df = pd.DataFrame({
+        'weekday': ['Monday'] + ['Tuesday'] * 5 + ['Wednesday'] * 200,
+        'value': [7.0] + [3.0] * 5 + list(np.random.default_rng(0).normal(10, 2, 200))
+    })
+
+    curves = eda_stats.kde_curves(df, 'value', 'weekday', grid_size=256)
+
+    for density in curves['density']:
+        span = ~np.isnan(density)
+        assert span.any()
+        assert density[span].max() > 0
+
+def test_kde_curves_only_constant_values():
+    df = pd.DataFrame({'weekday': ['Monday', 'Monday', 'Friday'], 'value': [5.0, 5.0, 5.0]})
+
+    curves = eda_stats.kde_curves(df, 'value', 'weekday', grid_size=256)
+
+    assert all(np.nanmax(density) > 0 for density in curves['density'])
+
+def test_stratified_sample_stays_within_budget_with_many_small_groups():
+    df = pd.DataFrame({'liquor_type': ['big'] * 1000 + ['small' + str(group) for group in range(30)]})
+
+    sample = eda_stats.stratified_sample(df, 'liquor_type', 50)
+
+    assert len(sample.index) == 50
+    assert set(df['liquor_type']) <= set(sample['liquor_type'])
+    assert sample.index.is_monotonic_increasing
+
+def test_stratified_sample_with_more_groups_than_budget():
+    df = pd.DataFrame({'liquor_type': ['big'] * 100 + ['medium'] * 50 + ['small' + str(group) for group in range(30)]})
+
+    sample = eda_stats.stratified_sample(df, 'liquor_type', 10)
+
+    assert len(sample.index) == 10
+    assert sample['liquor_type'].is_unique
+    assert {'big', 'medium'} <= set(sample['liquor_type'])
+
+def test_nice_bin_edges_cover_the_values_with_round_bins():
+    values = np.random.default_rng(1).normal(37, 12, 1000)
+
+    edges = eda_stats.nice_bin_edges(values, 30)
+    sizes = np.diff(edges)
+
+    assert edges[0] <= values.min() and edges[-1] > values.max()
+    np.testing.assert_allclose(sizes, sizes[0])
+    assert sizes[0] / 10 ** np.floor(np.log10(sizes[0])) in [1, 2, 2.5, 5]
+    assert 15 <= len(sizes) <= 31
+
+def test_histogram2d_matches_numpy():
+    rng = np.random.default_rng(2)
+    x = rng.gamma(2, 10, 5000)
+    y = rng.normal(0, 3, 5000)
+    x[:10] = np.nan
+    y[10:15] = np.inf
+
+    binned = eda_stats.histogram2d(x, y, 20, 15)
+
+    valid = np.isfinite(x) & np.isfinite(y)
+    edges_x = eda_stats.nice_bin_edges(x[valid], 20)
+    edges_y = eda_stats.nice_bin_edges(y[valid], 15)
+    expected, _, _ = np.histogram2d(x[valid], y[valid], bins=[edges_x, edges_y])
+
+    np.testing.assert_array_equal(binned['z'], expected.T)
+    np.testing.assert_allclose(binned['x'], (edges_x[:-1] + edges_x[1:]) / 2)
+    np.testing.assert_allclose(binned['y'], (edges_y[:-1] + edges_y[1:]) / 2)
+    assert binned['z'].sum() == valid.sum()
+
+def test_histogram2d_without_finite_pairs():
+    binned = eda_stats.histogram2d(np.array([np.nan, 1.0]), np.array([2.0, np.nan]), 10, 10)
+
+    assert binned['z'].shape == (0, 0)
+
+def test_box_statistics_match_the_plotly_quartiles_and_fences():
+    rng = np.random.default_rng(3)
+    df = pd.DataFrame({
+        'vendor_name': rng.choice(['Diageo', 'Sazerac', 'Luxco'], 3000),
+        'state_bottle_retail': rng.lognormal(2, 0.6, 3000)
+    })
+    df.loc[df.index[:3], 'vendor_name'] = 'Single'
+    df.loc[df.index[5], 'state_bottle_retail'] = np.nan
+
+    stats, outliers = eda_stats.box_statistics(df, 'state_bottle_retail', 'vendor_name', max_outliers=20)
+
+    assert list(stats['vendor_name']) == list(df['vendor_name'].unique())
+    for _, row in stats.iterrows():
+        values = df.loc[df['vendor_name'] == row['vendor_name'], 'state_bottle_retail'].dropna().to_numpy()
+        # plotly.js 'linear' quartiles are the hazen quantiles
+        q1, median, q3 = np.percentile(values, [25, 50, 75], method='hazen')
+        inside = values[(values >= q1 - 1.5 * (q3 - q1)) & (values <= q3 + 1.5 * (q3 - q1))]
+
+        np.testing.assert_allclose([row['q1'], row['median'], row['q3']], [q1, median, q3])
+        np.testing.assert_allclose([row['lowerfence'], row['upperfence']], [min(inside.min(), q1), max(inside.max(), q3)])
+
+        group_outliers = outliers.loc[outliers['vendor_name'] == row['vendor_name'], 'state_bottle_retail'].to_numpy()
+        all_outliers = np.setdiff1d(values, inside)
+        assert len(group_outliers) <= 21
+        assert np.isin(group_outliers, all_outliers).all()
+        if (len(all_outliers) > 0):
+            assert group_outliers.min() == all_outliers.min() and group_outliers.max() == all_outliers.max()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import fast_forecasting
+
+def daily_series(days: int = 420, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range('2021-01-01', periods=days, freq='D')
+    weekly = 20 * np.sin(2 * np.pi * np.arange(days) / 7)
+
+    return pd.DataFrame({'ds': ds, 'y': 500 + 0.5 * np.arange(days) + weekly + rng.normal(0, 2, days)})
+
+def test_fit_recovers_a_linear_trend():
+    df = daily_series()
+    df['y'] = 100 + 2.0 * np.arange(len(df.index))
+
+    model = fast_forecasting.fit(df, False, False, False, False)
+    forecast = fast_forecasting.predict(model, fast_forecasting.make_future_dataframe(model, 30), 0.95)
+
+    np.testing.assert_allclose(forecast['yhat'], 100 + 2.0 * np.arange(len(df.index) + 30))
+    np.testing.assert_allclose(forecast['trend'], forecast['yhat'])
+
+def test_fit_captures_the_weekly_seasonality():
+    df = daily_series()
+
+    model = fast_forecasting.fit(df, True, False, False, False)
+    forecast = fast_forecasting.predict(model, df[['ds']], 0.8)
+
+    residuals = df['y'] - forecast['yhat']
+    assert residuals.std() < 5
+    assert forecast['weekly'].max() - forecast['weekly'].min() > 30
+
+def test_predict_returns_the_prophet_forecast_frame():
+    df = daily_series()
+    model = fast_forecasting.fit(df, True, True, True, True)
+
+    future = fast_forecasting.make_future_dataframe(model, 60)
+    narrow = fast_forecasting.predict(model, future, 0.5)
+    wide = fast_forecasting.predict(model, future, 0.95)
+
+    assert len(future.index) == len(df.index) + 60
+    assert (future['ds'].iloc[len(df.index):] > df['ds'].max()).all()
+    assert {'ds', 'trend', 'weekly', 'monthly', 'yearly', 'holidays', 'additive_terms', 'yhat', 'yhat_lower', 'yhat_upper'} <= set(wide.columns)
+    assert ((wide['yhat_lower'] < narrow['yhat_lower']) & (narrow['yhat_lower'] < narrow['yhat']) & (narrow['yhat'] < narrow['yhat_upper']) & (narrow['yhat_upper'] < wide['yhat_upper'])).all()
+
+def test_monthly_future_dates():
+    model = fast_forecasting.fit(daily_series(), True, False, False, False)
+
+    future = fast_forecasting.make_future_dataframe(model, 3, freq='M')
+
+    assert list(future['ds'].iloc[-3:]) == list(pd.to_datetime(['2022-02-28', '2022-03-31', '2022-04-30']))
+
+def test_cross_validate_skips_days_without_sales_in_the_mape():
+    df = daily_series()
+    df.loc[df['ds'].dt.weekday == 6, 'y'] = 0
+
+    metrics = fast_forecasting.cross_validate(df, fast_forecasting.fit(df, True, False, False, False))
+
+    assert np.isfinite(metrics['mape']) and metrics['mape'] > 0
+    assert np.isfinite(metrics['rmse']) and metrics['rmse'] > 0
+
+def test_cross_validate_needs_the_initial_window():
+    df = daily_series(days=300)
+
+    with pytest.raises(ValueError):
+        fast_forecasting.cross_validate(df, fast_forecasting.fit(df, True, False, False, False))
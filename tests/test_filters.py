@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import filters
+
+def _frame() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    rows = 500
+
+    county = rng.choice(['Polk', 'Linn', 'Scott', None], rows).astype(object)
+    return pd.DataFrame({
+        'Date': np.sort(pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 90, rows), unit='D')),
+        'county': county,
+        'city': pd.Categorical(rng.choice(['Ames', 'Ankeny', 'Urbandale'], rows), categories=['Ames', 'Ankeny', 'Urbandale', 'Boone']),
+        'vendor_name': rng.choice(['Diageo', 'Sazerac'], rows)
+    })
+
+@pytest.mark.parametrize('start_date, end_date, selections', [
+    ('2021-01-01', '2021-03-31', []),
+    ('2021-01-15', '2021-02-15', [('county', ['Polk'])]),
+    ('2021-02-01', '2021-03-31', [('county', ['Polk', 'Scott']), ('city', ['Ames'])]),
+    ('2021-01-01', '2021-03-31', [('city', ['Boone'])]),
+    ('2021-01-01', '2021-03-31', [('county', ['Des Moines']), ('vendor_name', ['Diageo'])]),
+    ('2021-01-10', '2021-01-10', [('vendor_name', ['Diageo', 'Sazerac']), ('county', [])]),
+    ('2022-01-01', '2022-12-31', [('county', ['Linn'])])
+])
+def test_query_filter_index_matches_boolean_masks(start_date, end_date, selections):
+    df = _frame()
+    index = filters.build_filter_index(df, ['county', 'city', 'vendor_name'])
+
+    mask = (df['Date'] >= start_date) & (df['Date'] <= end_date)
+    for column, values in selections:
+        if (len(values) > 0):
+            mask &= df[column].isin(values)
+
+    positions = filters.query_filter_index(index, start_date, end_date, selections)
+
+    np.testing.assert_array_equal(positions, np.flatnonzero(mask.to_numpy()))
+
+def test_build_filter_index_needs_a_date_sorted_frame():
+    df = _frame().iloc[::-1]
+
+    with pytest.raises(ValueError):
+        filters.build_filter_index(df, ['county'])
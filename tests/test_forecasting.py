@@ -0,0 +1,175 @@
+import os
+import pytest
+import numpy as np
+
+pytest.importorskip("fbprophet")
+
+from helpers import forecasting
+
+def write_file(path, size: int, mtime: float):
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+def test_model_store_evicts_least_recently_used_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'MODEL_STORE_MAX_BYTES', 2500)
+
+    write_file(os.path.join(tmp_path, 'old.json'), 1000, 100)
+    write_file(os.path.join(tmp_path, 'old.metrics.json'), 10, 100)
+    write_file(os.path.join(tmp_path, 'used.json'), 1000, 200)
+    os.makedirs(os.path.join(tmp_path, 'warm_start'))
+
+    forecasting._write_metrics_to_disk('new', {'mape': 0.1, 'rmse': 1.0})
+    write_file(os.path.join(tmp_path, 'newer.json'), 1000, 300)
+    forecasting._write_metrics_to_disk('newer', {'mape': 0.1, 'rmse': 1.0})
+
+    assert sorted(os.listdir(tmp_path)) == ['new.metrics.json', 'newer.json', 'newer.metrics.json', 'used.json', 'warm_start']
+
+def test_model_store_read_marks_key_as_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'MODEL_STORE_MAX_BYTES', 1000)
+
+    write_file(os.path.join(tmp_path, 'a.json'), 700, 100)
+    forecasting._write_metrics_to_disk('a', {'mape': 0.1, 'rmse': 1.0})
+    write_file(os.path.join(tmp_path, 'b.json'), 700, 200)
+    os.utime(os.path.join(tmp_path, 'a.metrics.json'), (50, 50))
+
+    assert forecasting._read_metrics_from_disk('a') == {'mape': 0.1, 'rmse': 1.0}
+    forecasting._write_metrics_to_disk('c', {'mape': 0.1, 'rmse': 1.0})
+
+    assert 'b.json' not in os.listdir(tmp_path)
+    assert 'a.metrics.json' in os.listdir(tmp_path)
+
+class FittedModel:
+    # parameters in the shape Prophet keeps them after a fit
+    def __init__(self, k: float):
+        self.params = {'k': [[k]], 'm': [[0.2]], 'sigma_obs': [[0.3]], 'delta': [np.zeros(3)], 'beta': [np.zeros(4)]}
+
+def test_warm_start_store_keeps_the_newest_fits_per_group(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'WARM_START_MAX_PER_GROUP', 4)
+
+    for i in range(6):
+        forecasting._write_warm_start('group', 'fit' + str(i), np.full(10, i / 100), FittedModel(float(i)))
+
+    assert sorted(os.listdir(tmp_path / 'group')) == ['fit2.npz', 'fit3.npz', 'fit4.npz', 'fit5.npz', 'index.npz']
+
+def test_warm_start_lookup_reads_the_index_and_one_candidate(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path))
+
+    for i in range(8):
+        forecasting._write_warm_start('group', 'fit' + str(i), np.full(10, i / 100), FittedModel(float(i)))
+
+    loaded = []
+    load = np.load
+    monkeypatch.setattr(np, 'load', lambda path, *args, **kwargs: loaded.append(os.path.basename(path)) or load(path, *args, **kwargs))
+
+    init = forecasting._find_warm_start('group', np.full(10, 0.031))
+
+    assert init['k'] == 3.0
+    assert loaded == ['index.npz', 'fit3.npz']
+    assert forecasting._find_warm_start('group', np.full(10, 0.5)) is None
+
+def daily_series(seed: int):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range('2020-01-01', periods=400, freq='D')
+    return pd.DataFrame({'ds': ds, 'y': 100 + 10 * np.sin(np.arange(400) * 2 * np.pi / 7) + rng.normal(0, 1, 400)})
+
+def test_fits_report_how_they_were_started(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path / 'warm_start'))
+    params = forecasting._model_params(True, False, False, False)
+
+    _, cold = forecasting.fit_model(daily_series(0), params)
+    _, warm = forecasting.fit_model(daily_series(1), params)
+    _, stored = forecasting.fit_model(daily_series(0), params)
+
+    assert cold.fit_stats['fit'] == 'cold' and cold.fit_stats['seconds'] > 0
+    assert warm.fit_stats['fit'] == 'warm'
+    assert stored is cold
+
+def test_background_fits_go_through_the_disk_store_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path / 'warm_start'))
+    monkeypatch.setattr(forecasting, '_cross_validate', lambda model, parallel: {'mape': 0.1, 'rmse': 2.0})
+    monkeypatch.setattr(forecasting, '_model_cache', forecasting.LRUCache(max_entries=4))
+    monkeypatch.setattr(forecasting, '_metrics_cache', forecasting.LRUCache(max_entries=4))
+    series = daily_series(2)
+
+    key = forecasting.fit_and_validate(series, True, False, False, False)
+
+    assert forecasting.cache_info()['models']['entries'] == 0
+    assert forecasting.cache_info()['metrics']['entries'] == 0
+    assert os.path.exists(os.path.join(tmp_path, key + '.json'))
+
+    # the app worker reads the stored model once, then serves it from memory
+    reads = []
+    read = forecasting._read_model_from_disk
+    monkeypatch.setattr(forecasting, '_read_model_from_disk', lambda key: reads.append(key) or read(key))
+
+    for _ in range(2):
+        result = forecasting.get_forecast(series, 1, 80, True, False, False, False, fit=False)
+        assert result['mape'] == 0.1
+
+    assert reads == [key]
+    assert forecasting.cache_info()['models']['hits'] == 1
+
+def test_horizon_and_interval_changes_only_predict(tmp_path, monkeypatch):
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path / 'warm_start'))
+    monkeypatch.setattr(forecasting, '_cross_validate', lambda model, parallel: {'mape': 0.1, 'rmse': 2.0})
+    monkeypatch.setattr(forecasting, '_model_cache', forecasting.LRUCache(max_entries=4))
+    monkeypatch.setattr(forecasting, '_metrics_cache', forecasting.LRUCache(max_entries=4))
+    monkeypatch.setattr(forecasting, '_forecast_cache', forecasting.LRUCache(max_entries=8))
+    series = daily_series(3)
+    forecasting.get_forecast(series, 1, 80, True, False, False, False)
+
+    calls = []
+    monkeypatch.setattr(forecasting, '_fit', lambda *args: calls.append('fit'))
+    monkeypatch.setattr(forecasting, '_read_model_from_disk', lambda key: calls.append('read'))
+    predict = forecasting._predict
+    monkeypatch.setattr(forecasting, '_predict', lambda *args: calls.append('predict') or predict(*args))
+
+    for num_months_to_predict, conf_interval in [(3, 80), (3, 95), (1, 80), (3, 95)]:
+        result = forecasting.get_forecast(series, num_months_to_predict, conf_interval, True, False, False, False, fit=False)
+        assert result['model'].interval_width == conf_interval / 100
+        assert len(result['forecast'].index) == len(series.index) + int(round(num_months_to_predict * 30.5))
+
+    assert calls == ['predict', 'predict']
+
+def test_pages_serve_the_batch_forecast_of_a_covered_segment(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import pandas as pd
+
+    monkeypatch.setattr(forecasting, 'MODELPATH', str(tmp_path))
+    monkeypatch.setattr(forecasting, 'WARMSTARTPATH', str(tmp_path / 'warm_start'))
+    monkeypatch.setattr(forecasting, 'BATCH_FORECASTS', str(tmp_path / 'forecasts.parquet'))
+    monkeypatch.setattr(forecasting, '_cross_validate', lambda model, parallel: {'mape': 0.1, 'rmse': 2.0})
+    monkeypatch.setattr(forecasting, '_forecast_cache', forecasting.LRUCache(max_entries=8))
+    settings = dict(forecasting.BATCH_SETTINGS, yearly_seasonality=False, holidays=False)
+    series = daily_series(4)
+
+    results = pd.concat([forecasting.forecast_segment('Rum', None, 'bottles_sold', series, settings),
+        forecasting.forecast_segment(None, 'Diageo', 'bottles_sold', daily_series(5), settings)], ignore_index=True)
+    results.to_parquet(forecasting.BATCH_FORECASTS, index=False)
+
+    predicted = []
+    predict = forecasting._predict
+    monkeypatch.setattr(forecasting, '_predict', lambda *args: predicted.append(args[1:]) or predict(*args))
+
+    result = forecasting.get_forecast(series, 6, 95, True, True, False, False, fit=False)
+    batch = results[results['liquor_type'] == 'Rum']
+
+    assert predicted == []
+    assert len(result['forecast'].index) == len(series.index) + 183
+    np.testing.assert_allclose(result['forecast']['yhat'], batch['yhat'].iloc[:len(series.index) + 183])
+    assert {'trend', 'weekly', 'monthly'} <= set(result['forecast'].columns)
+
+    # another interval width, or a longer horizon than the batch, is predicted
+    forecasting.get_forecast(series, 6, 80, True, True, False, False, fit=False)
+    forecasting.get_forecast(series, 13, 95, True, True, False, False, fit=False)
+
+    assert predicted == [(0.8, 183, 'D'), (0.95, 396, 'D')]
@@ -0,0 +1,43 @@
+import os
+import pytest
+import pandas as pd
+
+pytest.importorskip("pyarrow")
+
+from helpers import dataset, data_transformation, ingest
+
+def test_ingest_writes_one_file_per_month_and_chunk(tmp_path, capsys):
+    source = os.path.join(str(tmp_path), 'sales.csv')
+    pd.read_csv(dataset.SALES_CSV, index_col=False, nrows=3000).to_csv(source, index=False)
+    output = os.path.join(str(tmp_path), 'partitions')
+    progress = []
+
+    rows = ingest.ingest(source, output, chunksize=1000, progress=progress.append)
+
+    assert rows == 3000
+    assert progress == [1000, 2000, 3000]
+    assert capsys.readouterr().out == ''
+
+    for year, month in dataset.list_month_partitions(output):
+        names = os.listdir(dataset.month_partition_directory(output, year, month))
+        assert all(name in ['part-0.parquet', 'part-1.parquet', 'part-2.parquet'] for name in names)
+
+    assert len(ingest.read_partitions(output).index) == 3000
+
+def test_ingest_writes_the_daily_series_of_all_chunks(tmp_path):
+    from helpers import daily_series
+
+    source = os.path.join(str(tmp_path), 'sales.csv')
+    pd.read_csv(dataset.SALES_CSV, index_col=False, nrows=3000).to_csv(source, index=False)
+    output = os.path.join(str(tmp_path), 'partitions')
+
+    ingest.ingest(source, output, chunksize=700)
+
+    expected = daily_series.build_daily_series(ingest._transform_chunk(pd.read_csv(source, index_col=False, dtype=data_transformation.SALES_DTYPES)))
+    store = ingest.read_daily_series(output)
+
+    for metric in daily_series.SERIES_METRICS:
+        assert store['values'][metric].sum() == pytest.approx(expected['values'][metric].sum())
+    assert store['rows'].sum() == 3000
+    assert store['dates'].equals(expected['dates'])
+    assert len(store['segments'].index) == len(expected['segments'].index)
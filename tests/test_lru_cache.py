@@ -0,0 +1,65 @@
+import time
+import threading
+import pytest
+
+from helpers.lru_cache import LRUCache
+
+def test_get_or_compute_computes_once_for_concurrent_callers():
+    cache = LRUCache(max_entries=8)
+    calls = []
+    barrier = threading.Barrier(6)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_compute('key', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 6
+    assert cache.info()['misses'] == 1
+
+def test_get_or_compute_shares_values_too_large_to_store():
+    cache = LRUCache(max_entries=8, max_bytes=1, sizeof=len)
+    calls = []
+    barrier = threading.Barrier(4)
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'too large'
+
+    def worker():
+        barrier.wait()
+        results.append(cache.get_or_compute('key', compute))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['too large'] * 4
+
+def test_get_or_compute_retries_after_an_error():
+    cache = LRUCache(max_entries=8)
+
+    def fail():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute('key', fail)
+
+    assert cache.get_or_compute('key', lambda: 1) == 1
@@ -16,6 +16,11 @@ def get_unique_values(df: pd, column_name: str) -> pd:
     categories_without_nans = [x for x in categories if str(x) != 'nan']
     return sorted(categories_without_nans)
 
+def categorical_to_object(df: pd) -> pd:
+    # plotly express regroups hierarchical paths on its own and expects plain labels, not categoricals
+    categorical_columns = df.select_dtypes('category').columns
+    return df.astype({column: object for column in categorical_columns})
+
 def filter_df_by_dropdown_select(df: pd, dropdown_id: list(), column_name: str) -> pd:
     if (dropdown_id != None):
         if (len(dropdown_id) > 0):